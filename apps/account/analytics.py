@@ -0,0 +1,122 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import (
+    Aggregate,
+    Avg,
+    Count,
+    DecimalField,
+    ExpressionWrapper,
+    F,
+    FloatField,
+    Max,
+    Min,
+    StdDev,
+    Window,
+)
+from django.db.models.functions import NullIf, PercentRank
+
+from apps.common.versioning import get_versions, version_key
+
+INDICATORS = ['agility', 'strength', 'stamina', 'speed', 'stretch']
+PERCENTILES = {'p25': 0.25, 'median': 0.5, 'p75': 0.75}
+
+
+def indicator_average():
+    """Mean of the five physical indicators of an athlete, calculated by the database"""
+
+    total = sum((F(f'physical_indicators__{name}') for name in INDICATORS[1:]),
+                F(f'physical_indicators__{INDICATORS[0]}'))
+    return ExpressionWrapper(total / len(INDICATORS), output_field=DecimalField(max_digits=6, decimal_places=2))
+
+
+class PercentileCont(Aggregate):
+    """Continuous percentile of an ordered set, PostgreSQL percentile_cont"""
+
+    function = 'percentile_cont'
+    template = '%(function)s(%(fraction)s) WITHIN GROUP (ORDER BY %(expressions)s)'
+    output_field = FloatField()
+
+    def __init__(self, expression, fraction, **extra):
+        super().__init__(expression, fraction=float(fraction), **extra)
+
+
+def to_number(value, digits=2):
+    return None if value is None else round(float(value), digits)
+
+
+def get_distribution(queryset, group_by=None):
+    """
+    Count, mean, standard deviation, extremes and percentiles of every indicator and of their average
+    calculated with one aggregate query per call
+    :param queryset: athletes annotated with indicator_average
+    :param group_by: field name to calculate distributions per value of, None for the whole queryset
+    :return: distribution dict, or dict of distributions by group value
+    """
+    aggregates = {'athletes': Count('pk')}
+    for name in INDICATORS + ['average']:
+        column = 'indicator_average' if name == 'average' else f'physical_indicators__{name}'
+        aggregates.update({
+            f'{name}__average': Avg(column),
+            f'{name}__stddev': StdDev(column),
+            f'{name}__min': Min(column),
+            f'{name}__max': Max(column),
+        })
+        aggregates.update({f'{name}__{key}': PercentileCont(column, fraction) for key, fraction in PERCENTILES.items()})
+
+    queryset = queryset.order_by()
+    if group_by is None:
+        rows = [queryset.aggregate(**aggregates)]
+    else:
+        rows = queryset.values(group_by).annotate(**aggregates)
+
+    distributions = {}
+    for row in rows:
+        indicators = {}
+        for key, value in row.items():
+            if '__' in key:
+                name, statistic = key.split('__')
+                indicators.setdefault(name, {})[statistic] = to_number(value)
+        distributions[row.get(group_by)] = {'athletes': row['athletes'], 'indicators': indicators}
+    return distributions if group_by is not None else distributions[None]
+
+
+def get_rankings(queryset, partition_by=None):
+    """
+    Percentile rank and z-score of the indicator average of every athlete
+    calculated with window functions over the queryset or over its partitions
+    """
+    partition = [F(partition_by)] if partition_by else None
+    z_score = ExpressionWrapper(
+        (F('indicator_average') - Window(Avg('indicator_average'), partition_by=partition))
+        / NullIf(Window(StdDev('indicator_average'), partition_by=partition), 0),
+        output_field=FloatField(),
+    )
+    rows = queryset.annotate(
+        percentile=Window(PercentRank(), partition_by=partition, order_by=F('indicator_average').asc()),
+        z_score=z_score,
+    ).order_by('-indicator_average', 'pk')
+    fields = ['id', 'name', 'surname', 'club', 'indicator_average', 'percentile', 'z_score']
+    if partition_by:
+        fields.append(partition_by)
+    return [
+        {**row, 'indicator_average': to_number(row['indicator_average']),
+         'percentile': to_number(row['percentile'], 4), 'z_score': to_number(row['z_score'], 4)}
+        for row in rows.values(*fields)
+    ]
+
+
+def cached_analytics(key, models, calculate):
+    """
+    Returns analytics cached under the key together with version stamps of the models,
+    so any change of their rows calculates them again
+    """
+    versions = get_versions([version_key(model) for model in models])
+    digest = hashlib.sha1(repr((key, versions)).encode()).hexdigest()
+    cache_key = f'indicator_analytics:{digest}'
+    data = cache.get(cache_key)
+    if data is None:
+        data = calculate()
+        cache.set(cache_key, data, settings.RESPONSE_CACHE_TIMEOUT)
+    return data
@@ -1,6 +1,7 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
-from apps.account.signals import password_reset_token_created
+from apps.account.signals import backfill_members_count, password_reset_token_created
 
 
 class AccountConfig(AppConfig):
@@ -9,3 +10,11 @@ class AccountConfig(AppConfig):
 
     def activate_signals(self):
         return password_reset_token_created
+
+    def ready(self):
+        from apps.account.models import Athlete, Club, PhysicalIndicators, User
+        from apps.common.images import track_image_variants
+        from apps.common.versioning import track_versions
+        track_versions(Athlete, Club, PhysicalIndicators, User)
+        track_image_variants(Athlete, 'medical_certificate')
+        post_migrate.connect(backfill_members_count, sender=self)
@@ -0,0 +1,29 @@
+from datetime import date
+
+from django_filters import FilterSet, NumberFilter
+
+from apps.account.models import Athlete
+
+
+def years_before(day, years):
+    try:
+        return day.replace(year=day.year - years)
+    except ValueError:
+        return day.replace(year=day.year - years, day=28)
+
+
+class AthleteFilter(FilterSet):
+    min_age = NumberFilter(method='filter_min_age')
+    max_age = NumberFilter(method='filter_max_age')
+
+    class Meta:
+        model = Athlete
+        fields = ['club', 'sport_category', 'sex']
+
+    def filter_min_age(self, queryset, name, value):
+        """Age filters are turned into birthday ranges so the birthday index is used"""
+
+        return queryset.filter(birthday__lte=years_before(date.today(), int(value)))
+
+    def filter_max_age(self, queryset, name, value):
+        return queryset.filter(birthday__gt=years_before(date.today(), int(value) + 1))
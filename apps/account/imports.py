@@ -0,0 +1,174 @@
+import csv
+import io
+from collections import Counter
+from datetime import datetime
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from openpyxl import load_workbook
+from rest_framework import serializers
+
+from apps.account.models import Athlete, Club
+from apps.common.search import update_search_documents
+from apps.common.serializers import preload_related_fields
+from apps.common.versioning import bump_version
+
+IMPORT_CHUNK_SIZE = 500
+
+
+class AthleteImportSerializer(serializers.ModelSerializer):
+    """Validates one row of an athlete roster, existing athletes are matched by phone_number"""
+
+    birthday = serializers.DateField(input_formats=['%d-%m-%Y', 'iso-8601'], required=False, allow_null=True)
+
+    class Meta:
+        model = Athlete
+        fields = ['name', 'surname', 'phone_number', 'birthday', 'address', 'sex', 'club', 'sport_category',
+                  'achievements']
+        extra_kwargs = {
+            'phone_number': {'validators': []},
+        }
+
+
+def clean_cell(value):
+    if isinstance(value, str):
+        value = value.strip()
+    elif isinstance(value, float) and value.is_integer():
+        value = int(value)
+    elif isinstance(value, datetime):
+        value = value.date()
+    return value
+
+
+def clean_row(header, values):
+    """Row dict without empty cells, so they keep current values of existing athletes"""
+
+    return {name: value for name, value in zip(header, map(clean_cell, values)) if name and value not in (None, '')}
+
+
+def read_csv(file):
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    sample = text.readline()
+    dialect = csv.Sniffer().sniff(sample, delimiters=',;\t') if sample.strip() else csv.excel
+    reader = csv.reader(text, dialect)
+    header = [name.strip().lower() for name in next(csv.reader([sample], dialect), [])]
+    for number, values in enumerate(reader, start=2):
+        yield number, clean_row(header, values)
+
+
+def read_xlsx(file):
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(name).strip().lower() if name is not None else None for name in next(rows, ())]
+        for number, values in enumerate(rows, start=2):
+            yield number, clean_row(header, values)
+    finally:
+        workbook.close()
+
+
+READERS = {
+    'csv': read_csv,
+    'xlsx': read_xlsx,
+}
+
+
+def read_roster(file, name):
+    """
+    Iterates over rows of a CSV or XLSX roster without loading the whole file
+    :param file: binary file object
+    :param name: file name, its extension selects the format
+    :return: iterator of (row number, row dict)
+    """
+    extension = name.rsplit('.', 1)[-1].lower()
+    if extension not in READERS:
+        raise serializers.ValidationError('Поддерживаются только файлы CSV и XLSX')
+    return READERS[extension](file)
+
+
+def import_athletes(rows, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Creates and updates athletes from roster rows chunk by chunk.
+    Invalid rows are reported and skipped, the rest of the file is imported.
+    :param rows: iterable of (row number, row dict)
+    :param chunk_size: number of rows validated and written together
+    :return: dict with created and updated counters and errors by row number
+    """
+    report = {'created': 0, 'updated': 0, 'unchanged': 0, 'errors': []}
+    seen_phones = set()
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return report
+        import_chunk(chunk, seen_phones, report)
+
+
+def import_chunk(chunk, seen_phones, report):
+    serializer = AthleteImportSerializer()
+    preload_related_fields(serializer, [data for _, data in chunk], [])
+    valid = []
+    for number, data in chunk:
+        try:
+            validated_data = serializer.run_validation(data)
+        except serializers.ValidationError as exc:
+            report['errors'].append({'row': number, 'errors': exc.detail})
+            continue
+        if validated_data['phone_number'] in seen_phones:
+            message = 'Номер телефона повторяется в файле'
+            report['errors'].append({'row': number, 'errors': {'phone_number': [message]}})
+            continue
+        seen_phones.add(validated_data['phone_number'])
+        valid.append((number, validated_data))
+
+    try:
+        counters = save_chunk([validated_data for _, validated_data in valid])
+    except IntegrityError as exc:
+        report['errors'] += [{'row': number, 'errors': {'non_field_errors': [str(exc)]}} for number, _ in valid]
+        return
+    for name, value in counters.items():
+        report[name] += value
+
+
+@transaction.atomic
+def save_chunk(rows):
+    """
+    Writes validated rows with one lookup of existing athletes, one insert and one update.
+    Athletes changing sex are saved one by one, their signals recount event statistics.
+    """
+    existing = Athlete.objects.in_bulk([data['phone_number'] for data in rows], field_name='phone_number')
+    created = []
+    changed = []
+    changed_fields = set()
+    club_changes = Counter()
+    unchanged = 0
+    for data in rows:
+        athlete = existing.get(data['phone_number'])
+        if athlete is None:
+            athlete = Athlete(**data)
+            created.append(athlete)
+            club_changes[athlete.club_id] += 1
+            continue
+
+        old_club = athlete.club_id
+        fields = {name for name, value in data.items()
+                  if getattr(athlete, Athlete._meta.get_field(name).attname) != getattr(value, 'pk', value)}
+        for name in fields:
+            setattr(athlete, name, data[name])
+        if 'sex' in fields:
+            athlete.save()
+        elif fields:
+            changed.append(athlete)
+            changed_fields |= fields
+            club_changes[old_club] -= 1
+            club_changes[athlete.club_id] += 1
+        else:
+            unchanged += 1
+
+    Athlete.objects.bulk_create(created)
+    if changed:
+        Athlete.objects.bulk_update(changed, sorted(changed_fields))
+    Club.objects.apply_member_changes(club_changes)
+    update_search_documents(Athlete, created + changed)
+    bump_version(Athlete, *[athlete.pk for athlete in created + changed])
+    return Counter(created=len(created), updated=len(rows) - len(created) - unchanged, unchanged=unchanged)
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from apps.account.imports import IMPORT_CHUNK_SIZE, import_athletes, read_roster
+
+
+class Command(BaseCommand):
+    help = 'Creates and updates athletes from a CSV or XLSX roster, matching existing athletes by phone number'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to a .csv or .xlsx file')
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE,
+                            help='Number of rows validated and written together')
+
+    def handle(self, *args, **options):
+        with open(options['path'], 'rb') as roster:
+            try:
+                report = import_athletes(read_roster(roster, options['path']), options['chunk_size'])
+            except ValidationError as exc:
+                raise CommandError(exc.detail[0])
+        for error in report['errors']:
+            self.stderr.write(f"Row {error['row']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {report['created']}, updated {report['updated']}, unchanged {report['unchanged']}, "
+            f"rejected {len(report['errors'])} rows"
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.account.models import Club
+
+
+class Command(BaseCommand):
+    help = 'Reconciles denormalized club member counters with the athletes of the clubs'
+
+    def handle(self, *args, **options):
+        total = Club.objects.rebuild_members_count()
+        self.stdout.write(self.style.SUCCESS(f'Corrected {total} club member counters'))
@@ -1,6 +1,8 @@
 from datetime import date
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, Func, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.utils.crypto import get_random_string
 from django.contrib.auth.models import (
     AbstractBaseUser,
@@ -8,6 +10,24 @@ from django.contrib.auth.models import (
     PermissionsMixin,
 )
 
+from apps.account.analytics import indicator_average
+from apps.common.search import SearchableModel
+from apps.common.versioning import bump_version
+
+
+def calculate_age(birthday, today=None):
+    """Full years passed since birthday"""
+
+    today = today or date.today()
+    return today.year - birthday.year - ((today.month, today.day) < (birthday.month, birthday.day))
+
+
+class Age(Func):
+    """Full years passed since a date column, calculated by PostgreSQL like calculate_age"""
+
+    template = "date_part('year', age(current_date, %(expressions)s))::integer"
+    output_field = IntegerField()
+
 
 class UserManager(BaseUserManager):
     def create_user(self, email, name, surname, **extra_fields):
@@ -52,7 +72,7 @@ class UserManager(BaseUserManager):
         return user
 
 
-class User(AbstractBaseUser, PermissionsMixin):
+class User(AbstractBaseUser, PermissionsMixin, SearchableModel):
     """User model"""
 
     ADMIN = 'ADMIN'
@@ -81,6 +101,11 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     objects = UserManager()
 
+    search_document_fields = ['name', 'surname', 'email', 'number']
+
+    class Meta(SearchableModel.Meta):
+        pass
+
     def __str__(self):
         return f'{self.email}'
 
@@ -109,19 +134,53 @@ class Feedback(models.Model):
         return f'{self.phone, self.email}'
 
 
-class Club(models.Model):
+class ClubManager(models.Manager):
+    def apply_member_changes(self, changes):
+        """
+        Adds deltas to the member counters of the clubs
+        :param changes: mapping of club_id to a delta
+        """
+        changed = [club for club, delta in changes.items() if club is not None and delta]
+        for club in changed:
+            self.filter(pk=club).update(members_count=F('members_count') + changes[club])
+        if changed:
+            bump_version(Club, *changed)
+
+    @transaction.atomic
+    def rebuild_members_count(self):
+        """
+        Recalculates member counters that differ from the number of athletes of the club
+        :return: number of corrected clubs
+        """
+        members = Coalesce(Subquery(
+            Athlete.objects.filter(club=OuterRef('pk')).order_by().values('club')
+            .annotate(total=Count('pk')).values('total')
+        ), Value(0))
+        corrected = list(self.filter(~Q(members_count=members)).values_list('pk', flat=True))
+        if corrected:
+            self.filter(pk__in=corrected).update(members_count=members)
+            bump_version(Club, *corrected)
+        return len(corrected)
+
+
+class Club(SearchableModel):
     """CLub model"""
     address = models.CharField(max_length=100, blank=True)
     name = models.CharField(max_length=30, blank=True)
     min_age = models.IntegerField(blank=False, null=False, default=0)
     max_age = models.IntegerField(blank=False, null=False, default=100)
+    members_count = models.IntegerField(default=0, editable=False)
+
+    objects = ClubManager()
+
+    search_document_fields = ['name', 'address']
 
     def __str__(self):
         return f'{self.name}'
 
     @property
     def sum_of_people(self):
-        return Athlete.objects.filter(club=self.pk).count()
+        return self.members_count
 
 
 class UserClub(models.Model):
@@ -129,6 +188,18 @@ class UserClub(models.Model):
     user = models.ForeignKey('User', on_delete=models.CASCADE, blank=False, null=False)
 
 
+class AthleteQuerySet(models.QuerySet):
+    def with_age(self):
+        """Annotates current_age calculated by the database"""
+
+        return self.annotate(current_age=Age('birthday'))
+
+    def with_indicator_average(self):
+        """Annotates indicator_average, the mean of the physical indicators calculated by the database"""
+
+        return self.annotate(indicator_average=indicator_average())
+
+
 class PhysicalIndicators(models.Model):
     agility = models.DecimalField(max_digits=4, decimal_places=2)
     strength = models.DecimalField(max_digits=4, decimal_places=2)
@@ -137,7 +208,7 @@ class PhysicalIndicators(models.Model):
     stretch = models.DecimalField(max_digits=4, decimal_places=2)
 
 
-class Athlete(models.Model):
+class Athlete(SearchableModel):
     female = 1
     male = 2
     CHOICES = [
@@ -173,19 +244,32 @@ class Athlete(models.Model):
     sex = models.IntegerField(choices=CHOICES, default=female)
     club = models.ForeignKey(Club, on_delete=models.CASCADE, blank=True, null=True)
     medical_certificate = models.ImageField(default=None, blank=True, null=True)
+    medical_certificate_digest = models.CharField(max_length=64, blank=True, default='', editable=False)
     physical_indicators = models.OneToOneField('PhysicalIndicators', on_delete=models.CASCADE, blank=True, null=True)
     sport_category = models.IntegerField(choices=CATEGORIES, default=None, blank=True, null=True)
 
+    objects = AthleteQuerySet.as_manager()
+
+    search_document_fields = ['name', 'surname', 'phone_number', 'address']
+
+    class Meta(SearchableModel.Meta):
+        indexes = SearchableModel.Meta.indexes + [
+            models.Index(fields=['birthday']),
+        ]
+
     def __str__(self):
         return f'{self.phone_number}'
 
     @property
     def average_of_PHI(self):
+        if 'indicator_average' in self.__dict__:
+            return self.indicator_average
         phy = self.physical_indicators
         average_of_PHI = (phy.agility + phy.strength + phy.stamina + phy.speed + phy.stretch) / 5
         return average_of_PHI
 
     @property
     def age(self):
-        age = int((date.today() - self.birthday).days / 365.2425)
-        return age
+        if 'current_age' in self.__dict__:
+            return self.current_age
+        return calculate_age(self.birthday)
@@ -5,8 +5,11 @@ from rest_framework import serializers
 from apps.account.models import Feedback, User, Referral, Club, Athlete, PhysicalIndicators, UserClub
 from drf_extra_fields.relations import PresentablePrimaryKeyRelatedField
 
+from apps.common.images import ImageVariantsField
+from apps.common.serializers import DynamicFieldsMixin
 
-class FeedbackSerializer(serializers.ModelSerializer):
+
+class FeedbackSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Feedback
         fields = [
@@ -17,7 +20,7 @@ class FeedbackSerializer(serializers.ModelSerializer):
         ]
 
 
-class RegisterUserSerializer(serializers.ModelSerializer):
+class RegisterUserSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for user registration"""
 
     referral_code = serializers.CharField(max_length=255, write_only=True, required=False, allow_blank=True)
@@ -71,12 +74,14 @@ class LoginUserSerializer(serializers.ModelSerializer):
         ]
 
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         exclude = [
             'groups',
             'user_permissions',
+            'search_document',
+            'search_vector',
         ]
         read_only_fields = [
             'last_login',
@@ -88,35 +93,35 @@ class UserProfileSerializer(serializers.ModelSerializer):
         }
 
 
-class ClubSerializer(serializers.ModelSerializer):
-    sum_of_people = serializers.IntegerField()
+class ClubSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    sum_of_people = serializers.IntegerField(source='members_count', read_only=True)
 
     class Meta:
         model = Club
-        fields = '__all__'
-        read_only_fields = ['sum_of_people']
+        exclude = ['search_document', 'search_vector', 'members_count']
 
 
-class PhysicalIndicatorsSerializer(serializers.ModelSerializer):
+class PhysicalIndicatorsSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = PhysicalIndicators
         fields = '__all__'
 
 
-class AthleteSerializer(serializers.ModelSerializer):
+class AthleteSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     age = serializers.IntegerField(read_only=True)
     average_of_PHI = serializers.DecimalField(max_digits=9, decimal_places=1, read_only=True)
     physical_indicators = PresentablePrimaryKeyRelatedField(queryset=PhysicalIndicators.objects.all(),
                                                             presentation_serializer=PhysicalIndicatorsSerializer)
     club = PresentablePrimaryKeyRelatedField(queryset=Club.objects.all(),
                                              presentation_serializer=ClubSerializer)
+    medical_certificate_variants = ImageVariantsField('medical_certificate')
 
     class Meta:
         model = Athlete
-        fields = '__all__'
+        exclude = ['search_document', 'search_vector', 'medical_certificate_digest']
 
 
-class UserClubSerializer(serializers.ModelSerializer):
+class UserClubSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     user = PresentablePrimaryKeyRelatedField(queryset=User.objects.all(),
                                              presentation_serializer=RegisterUserSerializer)
     club = PresentablePrimaryKeyRelatedField(queryset=Club.objects.all(),
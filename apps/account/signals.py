@@ -1,3 +1,4 @@
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.core.mail import send_mail
 
@@ -20,3 +21,34 @@ def password_reset_token_created(sender, instance, reset_password_token, *args,
         # to:
         [reset_password_token.user.email]
     )
+
+
+@receiver(pre_save, sender='account.Athlete')
+def remember_athlete_club(sender, instance, raw=False, **kwargs):
+    if not raw and instance.pk:
+        instance._original_club = sender.objects.filter(pk=instance.pk).values_list('club', flat=True).first()
+
+
+@receiver(post_save, sender='account.Athlete')
+def count_club_member(sender, instance, created, raw=False, **kwargs):
+    from apps.account.models import Club
+
+    if raw:
+        return
+    old_club = None if created else getattr(instance, '_original_club', None)
+    if old_club != instance.club_id:
+        Club.objects.apply_member_changes({old_club: -1, instance.club_id: 1})
+
+
+@receiver(post_delete, sender='account.Athlete')
+def uncount_club_member(sender, instance, **kwargs):
+    from apps.account.models import Club
+
+    Club.objects.apply_member_changes({instance.club_id: -1})
+
+
+def backfill_members_count(sender, using, **kwargs):
+    """Corrects club member counters after every migrate, so a newly added column starts with real counts"""
+    from apps.account.models import Club
+
+    Club.objects.db_manager(using).rebuild_members_count()
@@ -1,7 +1,10 @@
+from django.db.models import OuterRef, Subquery
+from rest_framework.decorators import action
 from rest_framework.filters import SearchFilter
 from rest_framework.generics import CreateAPIView
 from rest_framework.response import Response
-from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
+from rest_framework.parsers import MultiPartParser
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.viewsets import ModelViewSet, GenericViewSet
 from rest_framework import mixins
@@ -26,6 +29,14 @@ from apps.account.serializers import (
     PhysicalIndicatorsSerializer,
     UserClubSerializer
 )
+from apps.account.analytics import cached_analytics, get_distribution, get_rankings
+from apps.account.filters import AthleteFilter
+from apps.account.imports import import_athletes, read_roster
+from apps.common.eager_loading import EagerLoadingMixin
+from apps.common.search import FullTextSearchFilter
+from apps.common.versioning import ConditionalGetMixin
+from apps.logic.models import AgeGroup
+from apps.logic.serializers import AgeGroupSerializer, get_query_event
 
 
 class RegisterUserView(CreateAPIView):
@@ -70,7 +81,7 @@ class UserProfileView(GenericViewSet,
                       mixins.DestroyModelMixin):
     serializer_class = UserProfileSerializer
     queryset = User.objects.all()
-    filter_backends = [DjangoFilterBackend, SearchFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter]
     filter_fields = ['is_assistant', 'is_judge', 'role', 'is_active']
     search_fields = ['name', 'surname', 'email', 'number']
 
@@ -97,31 +108,100 @@ class FeedbackView(ModelViewSet):
     search_fields = ['email', 'phone']
 
 
-class ClubView(ModelViewSet):
+class ClubView(ConditionalGetMixin, ModelViewSet):
     serializer_class = ClubSerializer
     queryset = Club.objects.all()
-    filter_backends = [SearchFilter]
+    filter_backends = [FullTextSearchFilter]
     search_fields = ['name', 'address']
 
 
-class AthleteView(ModelViewSet):
+class AthleteView(EagerLoadingMixin, ModelViewSet):
     serializer_class = AthleteSerializer
-    queryset = Athlete.objects.all()
-    filter_backends = [DjangoFilterBackend, SearchFilter]
-    filter_fields = ['club', 'sport_category', 'sex']
+    queryset = Athlete.objects.with_age().with_indicator_average()
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter]
+    filter_class = AthleteFilter
     search_fields = ['name', 'surname', 'phone_number', 'address']
 
+    @staticmethod
+    def with_age_group(queryset, event):
+        """Annotates age_group_id of the event age group the athlete fits and drops athletes fitting none"""
+
+        bracket = AgeGroup.objects.filter(event=event, min_age__lte=OuterRef('current_age'),
+                                          max_age__gte=OuterRef('current_age')).order_by('min_age', 'max_age')
+        return queryset.annotate(age_group_id=Subquery(bracket.values('pk')[:1])).filter(age_group_id__isnull=False)
+
+    @action(detail=False)
+    def eligible(self, request):
+        """Athletes fitting the age groups of an event, bucketed by age group"""
+
+        event = get_query_event(request)
+        age_groups = list(AgeGroup.objects.filter(event=event).order_by('min_age', 'max_age'))
+        athletes = self.with_age_group(self.filter_queryset(self.get_queryset()), event)\
+            .order_by('surname', 'name', 'pk')
+
+        buckets = {age_group.pk: [] for age_group in age_groups}
+        for athlete in athletes:
+            buckets[athlete.age_group_id].append(athlete)
+        return Response([
+            {
+                'age_group': AgeGroupSerializer(age_group).data,
+                'athletes': self.get_serializer(buckets[age_group.pk], many=True).data,
+            }
+            for age_group in age_groups
+        ])
+
+    @action(detail=False)
+    def analytics(self, request):
+        """
+        Physical indicator distributions of the filtered athletes, per club and, with ?event=,
+        per age group of the event, with percentile ranks and z-scores of every athlete
+        """
+        event = get_query_event(request, required=False)
+        return Response(cached_analytics(request.get_full_path(), [Athlete, PhysicalIndicators, AgeGroup],
+                                         lambda: self.get_analytics(event)))
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_roster(self, request):
+        """
+        Creates and updates athletes from a CSV or XLSX roster in the file field,
+        existing athletes are matched by phone_number. Returns counters and errors by row.
+        """
+        roster = request.FILES.get('file')
+        if roster is None:
+            raise ValidationError({'file': ['Файл не передан']})
+        return Response(import_athletes(read_roster(roster, roster.name)))
+
+    def get_analytics(self, event=None):
+        athletes = self.filter_queryset(Athlete.objects.with_age().with_indicator_average())\
+            .filter(physical_indicators__isnull=False)
+        if event is not None:
+            athletes = self.with_age_group(athletes, event)
+        data = {
+            'summary': get_distribution(athletes),
+            'clubs': [{'club': club, **distribution}
+                      for club, distribution in get_distribution(athletes, 'club').items()],
+        }
+        if event is not None:
+            distributions = get_distribution(athletes, 'age_group_id')
+            data['age_groups'] = [
+                {'age_group': AgeGroupSerializer(age_group).data,
+                 **distributions.get(age_group.pk, {'athletes': 0, 'indicators': {}})}
+                for age_group in AgeGroup.objects.filter(event=event).order_by('min_age', 'max_age')
+            ]
+        data['athletes'] = get_rankings(athletes, 'age_group_id' if event is not None else None)
+        return data
+
 
 class PhysicalIndicatorsView(ModelViewSet):
     serializer_class = PhysicalIndicatorsSerializer
     queryset = PhysicalIndicators.objects.all()
 
 
-class UserClubView(ModelViewSet):
+class UserClubView(EagerLoadingMixin, ModelViewSet):
     serializer_class = UserClubSerializer
     queryset = UserClub.objects.all()
      
     def retrieve(self, request, pk):
-        queryset = UserClub.objects.filter(club=pk)
+        queryset = self.get_queryset().filter(club=pk)
         serializer_class = UserClubSerializer(queryset, many=True)
         return Response(serializer_class.data)
\ No newline at end of file
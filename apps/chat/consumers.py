@@ -6,11 +6,14 @@ from djangochannelsrestframework.generics import GenericAsyncAPIConsumer
 from djangochannelsrestframework import mixins
 from djangochannelsrestframework.observer.generics import (ObserverModelInstanceMixin, action)
 from djangochannelsrestframework.observer import model_observer
+from djangochannelsrestframework.permissions import IsAuthenticated
 
 from apps.account.models import User
 from apps.account.serializers import RegisterUserSerializer
 from apps.chat.models import Room, Message
 from apps.chat.serializers import RoomSerializer, MessageSerializer
+from apps.logic.models import ProtocolJob
+from apps.logic.serializers import ProtocolJobSerializer
 
 
 class RoomConsumer(ObserverModelInstanceMixin, GenericAsyncAPIConsumer):
@@ -112,3 +115,30 @@ class UserConsumer(
 ):
     queryset = User.objects.all()
     serializer_class = RegisterUserSerializer
+
+
+class ProtocolJobConsumer(mixins.RetrieveModelMixin, GenericAsyncAPIConsumer):
+    """Live progress of protocol generation jobs"""
+
+    queryset = ProtocolJob.objects.all()
+    serializer_class = ProtocolJobSerializer
+    permission_classes = (IsAuthenticated,)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.job_groups = set()
+
+    async def disconnect(self, code):
+        for group in self.job_groups:
+            await self.channel_layer.group_discard(group, self.channel_name)
+        await super().disconnect(code)
+
+    @action()
+    async def subscribe_to_job(self, pk, **kwargs):
+        job: ProtocolJob = await database_sync_to_async(self.get_object)(pk=pk)
+        await self.channel_layer.group_add(job.group_name, self.channel_name)
+        self.job_groups.add(job.group_name)
+        return ProtocolJobSerializer(job).data, 200
+
+    async def job_progress(self, event: dict):
+        await self.send_json(event["job"])
@@ -5,5 +5,6 @@ from apps.chat import consumers
 websocket_urlpatterns = [
     path("ws/", consumers.UserConsumer.as_asgi()),
     path("ws/chat/", consumers.RoomConsumer.as_asgi()),
+    path("ws/protocol_jobs/", consumers.ProtocolJobConsumer.as_asgi()),
 
 ]
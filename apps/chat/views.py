@@ -12,4 +12,5 @@ class RoomView(ModelViewSet):
 class MessageView(ModelViewSet):
     serializer_class = MessageSerializer
     queryset = Message.objects.all()
+    cursor_ordering = ['-created_at', '-id']
 
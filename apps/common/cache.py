@@ -0,0 +1,51 @@
+import time
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+class ReferenceCache:
+    """
+    Process-local cache for small, rarely changing reference tables.
+    Each process keeps its own copy of the loaded data and compares a version stamp
+    kept in the shared cache at most once per check_interval seconds, so an
+    invalidation in one worker reaches all the others.
+    """
+
+    check_interval = 5
+
+    def __init__(self, name, loader):
+        self.name = name
+        self.loader = loader
+        self._entries = {}
+
+    def _stamp_key(self, key):
+        return f'reference:{self.name}:{key}'
+
+    def get(self, key=None):
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and now < entry['checked_until']:
+            return entry['value']
+
+        stamp_key = self._stamp_key(key)
+        version = cache.get(stamp_key)
+        if version is None:
+            cache.add(stamp_key, uuid4().hex, None)
+            version = cache.get(stamp_key)
+
+        if entry is None or entry['version'] != version:
+            entry = {'version': version, 'value': self.loader(key)}
+        entry['checked_until'] = now + self.check_interval
+        self._entries[key] = entry
+        return entry['value']
+
+    def invalidate(self, key=None):
+        """Drops the local copy and bumps the shared version once the transaction commits"""
+
+        def bump():
+            self._entries.pop(key, None)
+            cache.set(self._stamp_key(key), uuid4().hex, None)
+
+        transaction.on_commit(bump)
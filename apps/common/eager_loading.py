@@ -0,0 +1,116 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch, prefetch_related_objects
+
+from rest_framework import serializers
+from drf_extra_fields.relations import PresentablePrimaryKeyRelatedField
+
+
+def get_nested_serializer(field):
+    """Returns the serializer a field renders related objects with, if any"""
+
+    if isinstance(field, serializers.ListSerializer):
+        return field.child
+    if isinstance(field, serializers.BaseSerializer):
+        return field
+    if isinstance(field, PresentablePrimaryKeyRelatedField):
+        return field.presentation_serializer(**field.presentation_serializer_kwargs)
+    return None
+
+
+def get_relation_tree(serializer, model):
+    """
+    Derives the relations a serializer walks while rendering instances of a model.
+    Forward single relations are joined, collections become Prefetch objects that
+    join their own nested relations.
+    :param serializer: serializer instance
+    :param model: model class the serializer renders
+    :return: tuple of select_related paths and prefetch_related lookups
+    """
+    select = []
+    prefetch = []
+    for field in serializer.fields.values():
+        if field.write_only or '.' in field.source or field.source == '*':
+            continue
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            continue
+        if not model_field.is_relation:
+            continue
+
+        nested = get_nested_serializer(field)
+        many = model_field.many_to_many or model_field.one_to_many
+        if nested is None and not (many and isinstance(field, serializers.ManyRelatedField)):
+            continue
+
+        related_model = model_field.related_model
+        nested_select, nested_prefetch = get_relation_tree(nested, related_model) if nested else ([], [])
+        if many:
+            queryset = related_model._default_manager.select_related(*nested_select) \
+                .prefetch_related(*nested_prefetch)
+            prefetch.append(Prefetch(field.source, queryset=queryset))
+        else:
+            select.append(field.source)
+            select.extend(f'{field.source}__{path}' for path in nested_select)
+            prefetch.extend(
+                Prefetch(f'{field.source}__{lookup.prefetch_through}', queryset=lookup.queryset)
+                for lookup in nested_prefetch
+            )
+    return select, prefetch
+
+
+def get_loaded_fields(serializer, model, annotations=()):
+    """
+    Model fields a serializer reads, with related fields of joined relations as paths.
+    Returns None when the serializer reads properties or methods that may need any column.
+    """
+    names = [model._meta.pk.name]
+    for field in serializer.fields.values():
+        if field.write_only or field.source in annotations:
+            continue
+        if field.source == '*' or '.' in field.source:
+            return None
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            return None
+        if not model_field.concrete:
+            continue
+        names.append(model_field.name)
+        nested = get_nested_serializer(field) if model_field.is_relation else None
+        if nested is not None:
+            nested_names = get_loaded_fields(nested, model_field.related_model)
+            names.extend(f'{model_field.name}__{name}' for name in nested_names or [])
+    return names
+
+
+class EagerLoadingMixin:
+    """
+    Loads the relation tree of the view serializer together with the queryset.
+    Serializers shaped with ?fields= also restrict the loaded columns.
+    """
+
+    def get_relation_tree(self):
+        serializer = self.get_serializer()
+        return get_relation_tree(serializer, serializer.Meta.model)
+
+    def get_queryset(self):
+        serializer = self.get_serializer()
+        model = serializer.Meta.model
+        select, prefetch = get_relation_tree(serializer, model)
+        queryset = super().get_queryset().select_related(*select).prefetch_related(*prefetch)
+
+        shape = serializer.get_shape() if hasattr(serializer, 'get_shape') else None
+        if shape is not None and shape[0] is not None:
+            loaded = get_loaded_fields(serializer, model, queryset.query.annotations)
+            if loaded is not None:
+                ordering = [name.lstrip('-') for name in getattr(self, 'cursor_ordering', None) or ['id']]
+                queryset = queryset.only(*loaded, *ordering)
+        return queryset
+
+    def eager_load(self, instances):
+        """Loads the relation tree for already fetched or just created instances"""
+
+        select, prefetch = self.get_relation_tree()
+        prefetch_related_objects(instances, *select, *prefetch)
+        return instances
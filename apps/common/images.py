@@ -0,0 +1,146 @@
+import hashlib
+from io import BytesIO
+
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.db.models.signals import post_save, pre_save
+from PIL import Image, ImageOps
+from rest_framework import serializers
+from rest_framework.reverse import reverse
+
+from apps.common.tasks import run_after_commit
+from apps.common.versioning import bump_version
+
+IMAGE_VARIANTS = {
+    'thumbnail': {'size': (320, 320), 'quality': 75},
+    'preview': {'size': (1280, 1280), 'quality': 80},
+}
+
+image_fields = {}
+
+
+def digest_field(field_name):
+    return f'{field_name}_digest'
+
+
+def variant_name(digest, variant):
+    """Variants are stored under the sha256 of the source, so equal uploads share them"""
+
+    return f'variants/{digest}/{variant}.jpg'
+
+
+def file_digest(field_file):
+    sha256 = hashlib.sha256()
+    with field_file.open('rb') as source:
+        for chunk in source.chunks():
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def render_variant(field_file, variant):
+    """Resized, EXIF rotated and re-encoded progressive JPEG of an image file"""
+
+    options = IMAGE_VARIANTS[variant]
+    with field_file.open('rb') as source, Image.open(source) as image:
+        image.draft('RGB', options['size'])
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        image.thumbnail(options['size'], Image.Resampling.LANCZOS)
+        output = BytesIO()
+        image.save(output, 'JPEG', quality=options['quality'], optimize=True, progressive=True)
+    return ContentFile(output.getvalue())
+
+
+def generate_variants(field_file):
+    """
+    Stores missing variants of an image file
+    :param field_file: FieldFile of an image
+    :return: sha256 digest of the source
+    """
+    digest = file_digest(field_file)
+    storage = field_file.storage
+    for variant in IMAGE_VARIANTS:
+        name = variant_name(digest, variant)
+        if not storage.exists(name):
+            saved = storage.save(name, render_variant(field_file, variant))
+            if saved != name:
+                storage.delete(saved)
+    return digest
+
+
+def store_variants(instance, field_name):
+    """Generates variants of an image field and remembers the digest of the source they were made from"""
+
+    field_file = getattr(instance, field_name)
+    digest = generate_variants(field_file)
+    model = instance.__class__
+    updated = model.objects.filter(pk=instance.pk, **{field_name: field_file.name})\
+        .update(**{digest_field(field_name): digest})
+    if updated:
+        setattr(instance, digest_field(field_name), digest)
+        bump_version(model, instance.pk)
+    return digest
+
+
+def generate_image_variants(label, pk, field_name):
+    instance = apps.get_model(label).objects.filter(pk=pk).first()
+    if instance is not None and getattr(instance, field_name):
+        store_variants(instance, field_name)
+
+
+def forget_changed_images(sender, instance, raw=False, **kwargs):
+    """Clears digests of replaced or removed images before the new file is committed"""
+
+    if raw:
+        return
+    for field_name in image_fields[sender._meta.label_lower]:
+        field_file = getattr(instance, field_name)
+        if not field_file or not field_file._committed:
+            setattr(instance, digest_field(field_name), '')
+
+
+def schedule_image_variants(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    for field_name in image_fields[sender._meta.label_lower]:
+        if getattr(instance, field_name) and not getattr(instance, digest_field(field_name)):
+            run_after_commit(generate_image_variants, sender._meta.label_lower, instance.pk, field_name)
+
+
+def track_image_variants(model, *field_names):
+    """
+    Generates variants of the image fields in the background after they are saved.
+    The model keeps the source digest of every field in <field>_digest.
+    """
+    label = model._meta.label_lower
+    image_fields[label] = field_names
+    pre_save.connect(forget_changed_images, sender=model, dispatch_uid=f'image_variants:{label}:pre_save')
+    post_save.connect(schedule_image_variants, sender=model, dispatch_uid=f'image_variants:{label}:post_save')
+
+
+class ImageVariantsField(serializers.Field):
+    """
+    URLs of the variants of an image field. Until the background worker has stored them
+    the URLs point to the lazy endpoint generating the variant on first request.
+    """
+
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        field_file = getattr(instance, self.image_field)
+        if not field_file:
+            return None
+        request = self.context.get('request')
+        digest = getattr(instance, digest_field(self.image_field))
+        if digest:
+            urls = {variant: field_file.storage.url(variant_name(digest, variant)) for variant in IMAGE_VARIANTS}
+            return {variant: request.build_absolute_uri(url) if request else url for variant, url in urls.items()}
+        return {
+            variant: reverse('image_variant', kwargs={'label': instance._meta.label_lower, 'pk': instance.pk,
+                                                      'field_name': self.image_field, 'variant': variant},
+                             request=request)
+            for variant in IMAGE_VARIANTS
+        }
@@ -0,0 +1,73 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+from apps.common.versioning import get_versions, version_key
+
+METRICS = ('hit', 'miss')
+
+
+def metric_key(view_name, metric):
+    return f'response_cache:{metric}:{view_name}'
+
+
+def record_metric(view_name, metric):
+    key = metric_key(view_name, metric)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def get_metrics(view_names):
+    """Hit and miss counters of the views as {view_name: {'hit': int, 'miss': int}}"""
+
+    values = cache.get_many([metric_key(name, metric) for name in view_names for metric in METRICS])
+    return {name: {metric: values.get(metric_key(name, metric), 0) for metric in METRICS} for name in view_names}
+
+
+def reset_metrics(view_names):
+    cache.delete_many([metric_key(name, metric) for name in view_names for metric in METRICS])
+
+
+class ResponseCacheMixin:
+    """
+    Caches serialized list responses in the shared cache.
+    The key includes the full path, the visibility scope of the user and version stamps
+    of cache_models, so any saved or deleted row of those models makes old entries unreachable.
+    Responses carry an X-Cache header and hits and misses are counted per view.
+    """
+
+    cache_models = []
+    cache_timeout = settings.RESPONSE_CACHE_TIMEOUT
+
+    def get_cache_scope(self, request):
+        if not request.user.is_authenticated:
+            return 'anonymous'
+        return request.user.role
+
+    def get_cache_key(self, request):
+        models = [self.queryset.model] + self.cache_models
+        versions = get_versions([version_key(model) for model in models])
+        digest = hashlib.sha1(repr((request.get_full_path(), self.get_cache_scope(request), versions)).encode())
+        return f'response_cache:{self.__class__.__name__}:{digest.hexdigest()}'
+
+    def list(self, request, *args, **kwargs):
+        view_name = self.__class__.__name__
+        key = self.get_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            record_metric(view_name, 'hit')
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        record_metric(view_name, 'miss')
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, self.cache_timeout)
+        response['X-Cache'] = 'MISS'
+        return response
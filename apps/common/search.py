@@ -0,0 +1,176 @@
+import re
+from datetime import date, datetime
+
+from django.apps import apps
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, SearchVectorField, TrigramSimilarity
+from django.db import connection, connections, models
+from django.db.models import F, Q, Value
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+from rest_framework.filters import SearchFilter
+
+SEARCH_CONFIG = 'simple'
+TSQUERY_SPECIAL_CHARACTERS = re.compile(r"[&|!():*<>'\\\s]+")
+
+
+class SearchableModel(models.Model):
+    """
+    Keeps a lowercased search document of the search_document_fields paths
+    with a trigram index for substring lookups and a tsvector index for ranked full-text lookups
+    """
+
+    search_document = models.TextField(default='', editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    search_document_fields = []
+
+    class Meta:
+        abstract = True
+        indexes = [
+            GinIndex(fields=['search_vector'], name='%(class)s_search_vector'),
+            GinIndex(fields=['search_document'], name='%(class)s_search_trgm', opclasses=['gin_trgm_ops']),
+        ]
+
+    def get_search_document(self):
+        values = []
+        for path in self.search_document_fields:
+            value = self
+            for attribute in path.split('__'):
+                value = getattr(value, attribute, None)
+                if value is None:
+                    break
+            if isinstance(value, datetime):
+                value = timezone.localtime(value)
+            if isinstance(value, date):
+                value = value.strftime('%d-%m-%Y')
+            if value not in (None, ''):
+                values.append(str(value))
+        return ' '.join(values).lower()
+
+
+def get_searchable_models():
+    return [model for model in apps.get_models() if issubclass(model, SearchableModel)]
+
+
+def get_dependent_querysets(instance):
+    """Querysets of searchable rows whose documents include fields of the instance through a relation"""
+
+    querysets = []
+    for model in get_searchable_models():
+        relations = {path.split('__', 1)[0] for path in model.search_document_fields if '__' in path}
+        for relation in relations:
+            if isinstance(instance, model._meta.get_field(relation).related_model):
+                querysets.append(model.objects.filter(**{relation: instance}))
+    return querysets
+
+
+def update_search_documents(model, objects):
+    """
+    Stores fresh search documents of the objects whose document changed
+    :param model: SearchableModel subclass
+    :param objects: iterable of model instances
+    :return: number of updated rows
+    """
+    changed = []
+    for obj in objects:
+        document = obj.get_search_document()
+        if document != obj.search_document:
+            obj.search_document = document
+            changed.append(obj)
+    if changed:
+        model.objects.bulk_update(changed, ['search_document'])
+    if changed and connection.vendor == 'postgresql':
+        model.objects.filter(pk__in=[obj.pk for obj in changed])\
+            .update(search_vector=SearchVector('search_document', config=SEARCH_CONFIG))
+    return len(changed)
+
+
+def get_related_paths(model):
+    return sorted({path.rsplit('__', 1)[0] for path in model.search_document_fields if '__' in path})
+
+
+def refresh_search_documents(model, queryset=None, chunk_size=1000):
+    """Recalculates search documents of a queryset chunk by chunk"""
+
+    queryset = (queryset if queryset is not None else model.objects.all())\
+        .select_related(*get_related_paths(model)).order_by('pk')
+    updated = 0
+    last_pk = None
+    while True:
+        chunk = queryset.filter(pk__gt=last_pk) if last_pk is not None else queryset
+        chunk = list(chunk[:chunk_size])
+        if not chunk:
+            return updated
+        updated += update_search_documents(model, chunk)
+        last_pk = chunk[-1].pk
+
+
+def search_document_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if isinstance(instance, SearchableModel):
+        update_search_documents(sender, [instance])
+    for queryset in get_dependent_querysets(instance):
+        refresh_search_documents(queryset.model, queryset)
+
+
+def track_search_documents():
+    """Connects search document updates to searchable models and to models their documents read through relations"""
+
+    senders = set()
+    for model in get_searchable_models():
+        senders.add(model)
+        for relation in {path.split('__', 1)[0] for path in model.search_document_fields if '__' in path}:
+            senders.add(model._meta.get_field(relation).related_model)
+    for sender in senders:
+        post_save.connect(search_document_changed, sender=sender,
+                          dispatch_uid=f'search_document:{sender._meta.label_lower}')
+
+
+def create_search_extensions(using='default', **kwargs):
+    """Trigram operator classes come from the pg_trgm extension, it has to exist before indexes are created"""
+
+    if connections[using].vendor == 'postgresql':
+        with connections[using].cursor() as cursor:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+
+def backfill_search_documents(using='default', **kwargs):
+    """Fills search documents and vectors of rows stored before they were indexed, so search finds them after deploy"""
+
+    for model in get_searchable_models():
+        refresh_search_documents(model, model.objects.filter(search_document=''))
+        if connections[using].vendor == 'postgresql':
+            model.objects.filter(search_vector__isnull=True)\
+                .update(search_vector=SearchVector('search_document', config=SEARCH_CONFIG))
+
+
+class FullTextSearchFilter(SearchFilter):
+    """
+    Search over the indexed search document of SearchableModel querysets.
+    Every term has to match either as a word prefix of the tsvector or as a substring
+    served by the trigram index; results are ordered by full-text rank and similarity.
+    Other models and databases fall back to the icontains lookups of SearchFilter.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = [term.lower() for term in self.get_search_terms(request)]
+        if not terms or not issubclass(queryset.model, SearchableModel) or connection.vendor != 'postgresql':
+            return super().filter_queryset(request, queryset, view)
+
+        prefixes = [f'{word}:*' for word in TSQUERY_SPECIAL_CHARACTERS.sub(' ', ' '.join(terms)).split()]
+        for term in terms:
+            words = TSQUERY_SPECIAL_CHARACTERS.sub(' ', term).split()
+            condition = Q(search_document__contains=term)
+            if words:
+                condition |= Q(search_vector=SearchQuery(' & '.join(f'{word}:*' for word in words),
+                                                         search_type='raw', config=SEARCH_CONFIG))
+            queryset = queryset.filter(condition)
+
+        rank = TrigramSimilarity('search_document', Value(' '.join(terms)))
+        if prefixes:
+            rank = rank + SearchRank(F('search_vector'), SearchQuery(' | '.join(prefixes), search_type='raw',
+                                                                     config=SEARCH_CONFIG))
+        return queryset.annotate(search_rank=rank).order_by('-search_rank', 'pk')
@@ -0,0 +1,274 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.utils.module_loading import import_string
+from drf_extra_fields.relations import PresentablePrimaryKeyRelatedField
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import empty
+from rest_framework_bulk import BulkListSerializer
+
+from apps.common.versioning import bump_version
+
+
+class PreloadedQuerySet:
+    """Answers get(pk=...) of a related field from rows fetched with one query"""
+
+    def __init__(self, queryset, pks):
+        self.model = queryset.model
+        self.objects = queryset.in_bulk(pks)
+
+    def all(self):
+        return self
+
+    def get(self, pk):
+        try:
+            pk = self.model._meta.pk.to_python(pk)
+        except DjangoValidationError:
+            raise ValueError(pk)
+        if pk not in self.objects:
+            raise self.model.DoesNotExist
+        return self.objects[pk]
+
+
+def get_valid_pks(model, values):
+    pks = set()
+    for value in values:
+        try:
+            if value is not None and not isinstance(value, (bool, dict, list)):
+                pks.add(model._meta.pk.to_python(value))
+        except DjangoValidationError:
+            pass
+    return pks
+
+
+def preload_related_fields(serializer, items, preloaded):
+    """
+    Replaces querysets of writable primary key fields of the serializer and its nested list serializers
+    with objects fetched for all items at once, remembering the original querysets in preloaded
+    """
+    for field in serializer.fields.values():
+        if field.read_only:
+            continue
+        if isinstance(field, serializers.PrimaryKeyRelatedField) and field.queryset is not None:
+            values = [item.get(field.field_name) for item in items if isinstance(item, dict)]
+            preloaded.append((field, field.queryset))
+            field.queryset = PreloadedQuerySet(field.queryset.all(), get_valid_pks(field.queryset.model, values))
+        elif isinstance(field, serializers.ListSerializer):
+            nested = [nested_item for item in items if isinstance(item, dict)
+                      for nested_item in item.get(field.field_name) or [] if isinstance(nested_item, dict)]
+            preload_related_fields(field.child, nested, preloaded)
+
+
+class PreloadRelatedFieldsMixin:
+    """List serializer mixin validating related objects of all items with one query per field"""
+
+    def to_internal_value(self, data):
+        preloaded = []
+        if isinstance(data, list):
+            preload_related_fields(self.child, data, preloaded)
+        try:
+            return super().to_internal_value(data)
+        finally:
+            for field, queryset in preloaded:
+                field.queryset = queryset
+
+
+class BulkUpdateListSerializer(PreloadRelatedFieldsMixin, BulkListSerializer):
+    """
+    Bulk list serializer validating related objects of all items with one query per field
+    and updating loaded instances with a single bulk_update of the changed fields.
+    Nested list fields named in nested_fields are passed to update_nested, others are rejected.
+    """
+
+    nested_fields = []
+
+    def validate(self, attrs):
+        if self.instance is None:
+            return attrs
+        unsupported = {name for name, field in self.child.fields.items()
+                       if isinstance(field, serializers.BaseSerializer) and not field.read_only
+                       and name not in self.nested_fields}
+        errors = [{name: ['Изменение вложенных объектов не поддерживается'] for name in unsupported & set(item)}
+                  for item in attrs]
+        if any(errors):
+            raise ValidationError(errors)
+        return attrs
+
+    def get_update_pks(self, all_validated_data, id_attr):
+        model = self.child.Meta.model
+        missing = [str(number) for number, data in enumerate(all_validated_data, 1) if data.get(id_attr) in (None, empty)]
+        if missing:
+            raise ValidationError({id_attr: [f'Не указан {id_attr} у объектов {", ".join(missing)}']})
+        pks = []
+        invalid = []
+        for data in all_validated_data:
+            try:
+                pks.append(model._meta.pk.to_python(data[id_attr]))
+            except DjangoValidationError:
+                invalid.append(str(data[id_attr]))
+        if invalid:
+            raise ValidationError({id_attr: [f'Некорректные значения {id_attr}: {", ".join(invalid)}']})
+        return pks
+
+    @transaction.atomic
+    def update(self, queryset, all_validated_data):
+        model = self.child.Meta.model
+        id_attr = getattr(self.child.Meta, 'update_lookup_field', 'id')
+        pks = self.get_update_pks(all_validated_data, id_attr)
+        data_by_pk = {}
+        for pk, data in zip(pks, all_validated_data):
+            data.pop(id_attr)
+            data_by_pk[pk] = data
+        instances = queryset.prefetch_related(None).in_bulk(list(data_by_pk))
+        unknown = [str(pk) for pk in data_by_pk if pk not in instances]
+        if unknown:
+            raise ValidationError({id_attr: [f'Объекты с {id_attr} {", ".join(unknown)} не найдены']})
+
+        nested_fields = {name for name, field in self.child.fields.items()
+                         if isinstance(field, serializers.BaseSerializer) and not field.read_only}
+        changed_fields = set()
+        changed = []
+        nested_data = {}
+        for pk, data in data_by_pk.items():
+            instance = instances[pk]
+            instance_changed = False
+            for attr, value in data.items():
+                if attr in nested_fields:
+                    nested_data.setdefault(attr, {})[pk] = value
+                    continue
+                field = model._meta.get_field(attr)
+                current = getattr(instance, field.attname)
+                if field.many_to_one or field.one_to_one:
+                    new = value.pk if value is not None else None
+                else:
+                    new = value
+                if current != new:
+                    setattr(instance, attr, value)
+                    changed_fields.add(attr)
+                    instance_changed = True
+            if instance_changed:
+                changed.append(instance)
+
+        if changed:
+            model.objects.bulk_update(changed, sorted(changed_fields))
+        self.update_nested(instances, nested_data)
+        bump_version(model, *data_by_pk)
+        return [instances[pk] for pk in data_by_pk]
+
+    def update_nested(self, instances, nested_data):
+        """
+        Writes nested list fields of the updated instances, only fields listed in nested_fields reach it
+        :param instances: dict of updated instances by pk
+        :param nested_data: {field name: {pk: validated nested data}}
+        """
+
+
+def parse_field_tree(value):
+    """Turns 'id,event.name,event.place' into {'id': {}, 'event': {'name': {}, 'place': {}}}"""
+
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for name in filter(None, path.strip().split('.')):
+            node = node.setdefault(name, {})
+    return tree
+
+
+def get_presentation_serializer(field):
+    if isinstance(field.presentation_serializer, str):
+        field.presentation_serializer = import_string(field.presentation_serializer)
+    return field.presentation_serializer
+
+
+def collapse_field(field):
+    """Read only primary key field rendering the relation of a field as bare ids"""
+
+    kwargs = {'read_only': True}
+    if field._kwargs.get('source'):
+        kwargs['source'] = field._kwargs['source']
+    many = isinstance(field, (serializers.ListSerializer, serializers.ManyRelatedField))
+    return serializers.PrimaryKeyRelatedField(many=many, **kwargs)
+
+
+def is_expandable(field):
+    if isinstance(field, serializers.ManyRelatedField):
+        field = field.child_relation
+    return isinstance(field, (serializers.BaseSerializer, serializers.RelatedField)) \
+        and type(field) is not serializers.PrimaryKeyRelatedField
+
+
+def shape_representation(data, only):
+    """Keeps the keys of a representation selected by a fields tree, recursively, None keeping everything"""
+
+    if only is None or not isinstance(data, dict):
+        return data
+    return {name: shape_representation(value, only[name] or None) for name, value in data.items() if name in only}
+
+
+class ShapedFieldMixin:
+    """
+    Relation field rendering a ready representation dict, e.g. from a reference cache.
+    DynamicFieldsMixin hands it its part of the shape like to nested serializers.
+    """
+
+    shape = None
+
+    def shape_representation(self, data):
+        return shape_representation(data, self.shape[0] if self.shape is not None else None)
+
+
+class DynamicFieldsMixin:
+    """
+    Shapes read responses by the ?fields= and ?expand= query parameters.
+    fields lists the rendered fields, dotted names select fields of related objects.
+    When expand is given, only the listed relations are rendered as objects and
+    all others as bare ids. Nested serializers receive their part of the shape.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.shape = kwargs.pop('shape', None)
+        super().__init__(*args, **kwargs)
+
+    def get_shape(self):
+        """Returns (fields tree, expand tree), None meaning all fields or all relations"""
+
+        if self.shape is not None:
+            return self.shape
+        parent = self.parent.parent if isinstance(self.parent, serializers.ListSerializer) else self.parent
+        request = self.context.get('request')
+        if parent is not None or request is None or request.method not in SAFE_METHODS:
+            return None
+        params = request.query_params
+        if 'fields' not in params and 'expand' not in params:
+            return None
+        return (parse_field_tree(params['fields']) if 'fields' in params else None,
+                parse_field_tree(params['expand']) if 'expand' in params else None)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        shape = self.get_shape()
+        if shape is None:
+            return fields
+        only, expand = shape
+        if only is not None:
+            fields = fields.__class__((name, field) for name, field in fields.items() if name in only)
+        for name, field in fields.items():
+            if not is_expandable(field):
+                continue
+            if expand is not None and name not in expand:
+                fields[name] = collapse_field(field)
+                continue
+            self.set_nested_shape(field, ((only or {}).get(name) or None, None if expand is None else expand[name]))
+        return fields
+
+    def set_nested_shape(self, field, shape):
+        if isinstance(field, serializers.ManyRelatedField):
+            field = field.child_relation
+        if isinstance(field, serializers.ListSerializer):
+            field = field.child
+        if isinstance(field, (DynamicFieldsMixin, ShapedFieldMixin)):
+            field.shape = shape
+        elif isinstance(field, PresentablePrimaryKeyRelatedField) \
+                and issubclass(get_presentation_serializer(field), DynamicFieldsMixin):
+            field.presentation_serializer_kwargs = {**field.presentation_serializer_kwargs, 'shape': shape}
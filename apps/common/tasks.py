@@ -0,0 +1,30 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(max_workers=settings.BACKGROUND_WORKERS, thread_name_prefix='background')
+
+
+def run_in_background(func, *args, **kwargs):
+    """Runs a function in the process worker pool, closing its database connections afterwards"""
+
+    def task():
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            logger.exception('Background task %s failed', func.__name__)
+            raise
+        finally:
+            connections.close_all()
+
+    return executor.submit(task)
+
+
+def run_after_commit(func, *args, **kwargs):
+    """Schedules a background function once the current transaction commits"""
+
+    transaction.on_commit(lambda: run_in_background(func, *args, **kwargs))
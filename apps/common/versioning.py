@@ -0,0 +1,93 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def version_key(model, pk=None):
+    key = f'version:{model._meta.label_lower}'
+    return key if pk is None else f'{key}:{pk}'
+
+
+def get_versions(keys):
+    """
+    Returns modification timestamps of the version keys with a single cache round trip,
+    keys missing from the cache start at the current time
+    """
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        now = time.time()
+        for key in missing:
+            cache.add(key, now, None)
+        versions.update(cache.get_many(missing))
+    return [versions.get(key, 0) for key in keys]
+
+
+def bump_version(model, *pks):
+    """Marks the collection of a model and the given rows as modified once the transaction commits"""
+
+    keys = [version_key(model)] + [version_key(model, pk) for pk in pks if pk is not None]
+    transaction.on_commit(lambda: cache.set_many(dict.fromkeys(keys, time.time()), None))
+
+
+def model_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_version(sender, instance.pk)
+
+
+def relation_changed(sender, instance, model, action, **kwargs):
+    if action.startswith('post_'):
+        bump_version(instance.__class__, instance.pk)
+        bump_version(model)
+
+
+def track_versions(*models):
+    for model in models:
+        label = model._meta.label_lower
+        post_save.connect(model_changed, sender=model, dispatch_uid=f'version:{label}:save')
+        post_delete.connect(model_changed, sender=model, dispatch_uid=f'version:{label}:delete')
+        for field in model._meta.many_to_many:
+            m2m_changed.connect(relation_changed, sender=field.remote_field.through,
+                                dispatch_uid=f'version:{label}:{field.name}')
+
+
+class ConditionalGetMixin:
+    """
+    Answers list and retrieve requests with strong ETag and Last-Modified headers built from
+    version stamps of the view model and of version_models it presents. A matching
+    If-None-Match or If-Modified-Since gets 304 before the queryset is touched.
+    """
+
+    version_models = []
+
+    def get_version_keys(self):
+        model = self.queryset.model
+        lookup = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        keys = [version_key(model, lookup) if lookup is not None else version_key(model)]
+        return keys + [version_key(related) for related in self.version_models]
+
+    def conditional_response(self, request, handler, *args, **kwargs):
+        versions = get_versions(self.get_version_keys())
+        digest = hashlib.sha1(repr((request.get_full_path(), versions)).encode()).hexdigest()
+        etag = f'"{digest}"'
+        last_modified = int(max(versions))
+
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().retrieve, *args, **kwargs)
@@ -0,0 +1,20 @@
+from django.apps import apps
+from django.shortcuts import get_object_or_404, redirect
+from rest_framework.exceptions import NotFound
+from rest_framework.views import APIView
+
+from apps.common.images import IMAGE_VARIANTS, digest_field, image_fields, store_variants, variant_name
+
+
+class ImageVariantView(APIView):
+    """Redirects to a variant of an image field, generating the variants when the background worker has not yet"""
+
+    def get(self, request, label, pk, field_name, variant):
+        if field_name not in image_fields.get(label, ()) or variant not in IMAGE_VARIANTS:
+            raise NotFound()
+        instance = get_object_or_404(apps.get_model(label), pk=pk)
+        field_file = getattr(instance, field_name)
+        if not field_file:
+            raise NotFound()
+        digest = getattr(instance, digest_field(field_name)) or store_variants(instance, field_name)
+        return redirect(field_file.storage.url(variant_name(digest, variant)))
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class DocsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.docs'
+
+    def ready(self):
+        from apps.common.versioning import track_versions
+        from apps.docs.models import Document
+        track_versions(Document)
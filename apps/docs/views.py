@@ -1,11 +1,12 @@
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.filters import SearchFilter
 
+from apps.common.versioning import ConditionalGetMixin
 from apps.docs.models import Document
 from apps.docs.serializers import DocumentSerializer
 
 
-class DocumentView(ModelViewSet):
+class DocumentView(ConditionalGetMixin, ModelViewSet):
     serializer_class = DocumentSerializer
     queryset = Document.objects.all()
     filter_backends = [SearchFilter]
@@ -9,6 +9,8 @@ from apps.logic.models import (
     SubgroupApplication,
     JudgeGroup,
     TemplateApplication,
+    EventStatistic,
+    ProtocolJob,
 )
 
 admin.site.register(Event)
@@ -20,3 +22,5 @@ admin.site.register(Subgroup)
 admin.site.register(SubgroupApplication)
 admin.site.register(JudgeGroup)
 admin.site.register(TemplateApplication)
+admin.site.register(EventStatistic)
+admin.site.register(ProtocolJob)
@@ -1,6 +1,19 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate, pre_migrate
 
 
 class LogicConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.logic'
+
+    def ready(self):
+        from apps.common.search import backfill_search_documents, create_search_extensions, track_search_documents
+        from apps.common.versioning import track_versions
+        from apps.logic import signals
+        from apps.logic.models import AgeGroup, Application, AthleteApplication, Discipline, Event, Subgroup, \
+            SubgroupApplication
+        pre_migrate.connect(create_search_extensions, sender=self)
+        post_migrate.connect(backfill_search_documents, sender=self)
+        post_migrate.connect(signals.backfill_event_statistics, sender=self)
+        track_search_documents()
+        track_versions(AgeGroup, Application, AthleteApplication, Discipline, Event, Subgroup, SubgroupApplication)
@@ -0,0 +1,95 @@
+import csv
+from itertools import chain
+from tempfile import TemporaryFile
+
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from openpyxl import Workbook
+
+from apps.account.models import Athlete
+from apps.logic.models import Discipline, Subgroup, SubgroupApplication
+
+PROTOCOL_HEADER = ['Подгруппа', 'Дисциплина', 'Пол', 'Возрастная группа', 'Начало', 'Фамилия', 'Имя', 'Клуб',
+                   'Возрастная группа участника', 'Разряд']
+PROTOCOL_FIELDS = [
+    'subgroup',
+    'subgroup__discipline__category',
+    'subgroup__discipline__is_individual',
+    'subgroup__discipline__with_weapon',
+    'subgroup__sex',
+    'subgroup__age_group',
+    'subgroup__start_datetime',
+    'application__athlete__surname',
+    'application__athlete__name',
+    'application__athlete__club__name',
+    'application__event_age_group',
+    'application__athlete__sport_category',
+]
+EXPORT_CHUNK_SIZE = 2000
+
+
+def discipline_label(category, is_individual, with_weapon):
+    if category is None:
+        return ''
+    label = dict(Discipline.CHOICES)[category]
+    if not is_individual:
+        label += ', командное'
+    if with_weapon:
+        label += ', с оружием'
+    return label
+
+
+def protocol_rows(event):
+    """
+    Yields protocol rows of an event one at a time from a chunked server-side cursor
+    :param event: Event
+    :return: generator of lists
+    """
+    sexes = dict(Subgroup.CHOICES)
+    categories = dict(Athlete.CATEGORIES)
+    rows = SubgroupApplication.objects.filter(subgroup__event=event)\
+        .order_by('subgroup__start_datetime', 'subgroup', 'pk').values_list(*PROTOCOL_FIELDS)
+    for (subgroup, category, is_individual, with_weapon, sex, age_group, start, surname, name, club,
+         event_age_group, sport_category) in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield [
+            subgroup,
+            discipline_label(category, is_individual, with_weapon),
+            sexes.get(sex, ''),
+            age_group or '',
+            timezone.localtime(start).strftime('%d-%m-%Y %H:%M') if start else '',
+            surname,
+            name,
+            club or '',
+            event_age_group or '',
+            categories.get(sport_category, ''),
+        ]
+
+
+class Echo:
+    """File-like object handing written csv lines back to the generator"""
+
+    def write(self, value):
+        return value
+
+
+def csv_protocol_response(event):
+    writer = csv.writer(Echo())
+    lines = chain(['\ufeff'], (writer.writerow(row) for row in chain([PROTOCOL_HEADER], protocol_rows(event))))
+    response = StreamingHttpResponse(lines, content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="protocol_{event.pk}.csv"'
+    return response
+
+
+def xlsx_protocol_response(event):
+    """Writes rows through a write-only workbook that keeps them on disk instead of in memory"""
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Протокол')
+    sheet.append(PROTOCOL_HEADER)
+    for row in protocol_rows(event):
+        sheet.append(row)
+    file = TemporaryFile()
+    workbook.save(file)
+    file.seek(0)
+    return FileResponse(file, as_attachment=True, filename=f'protocol_{event.pk}.xlsx',
+                        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
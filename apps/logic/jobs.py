@@ -0,0 +1,75 @@
+import logging
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from apps.common.tasks import run_after_commit
+from apps.logic.models import Event, ProtocolJob
+from apps.logic.protocol import generate_subgroups
+from apps.logic.rendering import refresh_protocol
+from apps.logic.serializers import ProtocolJobSerializer
+
+logger = logging.getLogger(__name__)
+
+
+def notify_job(job):
+    """Sends the job state to websocket clients subscribed to it, failures only cost the notification"""
+
+    try:
+        async_to_sync(get_channel_layer().group_send)(job.group_name, {
+            'type': 'job_progress',
+            'job': dict(ProtocolJobSerializer(job).data),
+        })
+    except Exception:
+        logger.exception('Could not notify subscribers of protocol job %s', job.pk)
+
+
+def update_job(job, **fields):
+    for name, value in fields.items():
+        setattr(job, name, value)
+    job.save(update_fields=[*fields, 'updated_at'])
+    notify_job(job)
+
+
+@transaction.atomic
+def start_protocol_job(event, user):
+    """
+    Queues protocol generation of an event unless it is already queued or running
+    :param event: Event
+    :param user: User starting the job
+    :return: ProtocolJob
+    """
+    Event.objects.select_for_update().filter(pk=event.pk).exists()
+    stale = timezone.now() - timedelta(seconds=settings.PROTOCOL_JOB_TIMEOUT)
+    ProtocolJob.objects.filter(event=event, status__in=ProtocolJob.ACTIVE, updated_at__lt=stale)\
+        .update(status=ProtocolJob.failed, message='Задание прервано', updated_at=timezone.now())
+    job = ProtocolJob.objects.filter(event=event, status__in=ProtocolJob.ACTIVE).first()
+    if job is None:
+        job = ProtocolJob.objects.create(event=event, created_by=user if user.is_authenticated else None)
+        run_after_commit(run_protocol_job, job.pk)
+    return job
+
+
+def run_protocol_job(job_id):
+    """Generates subgroups and renders the printable protocol, reporting progress of every stage"""
+
+    job = ProtocolJob.objects.select_related('event').filter(pk=job_id).first()
+    if job is None:
+        return
+    try:
+        update_job(job, status=ProtocolJob.running, progress=10, message='Формирование подгрупп')
+        subgroups = generate_subgroups(job.event)
+        if not subgroups:
+            update_job(job, status=ProtocolJob.done, progress=100,
+                       message='Одобренных заявок для данного мероприятия не найдено')
+            return
+        update_job(job, progress=60, subgroups_total=len(subgroups), message='Формирование протокола')
+        refresh_protocol(job.event)
+        update_job(job, status=ProtocolJob.done, progress=100, message='Протокол сформирован')
+    except Exception:
+        update_job(job, status=ProtocolJob.failed, message='Не удалось сформировать протокол')
+        raise
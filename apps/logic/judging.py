@@ -0,0 +1,149 @@
+import heapq
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from django.utils import timezone
+
+from apps.logic.models import JudgeGroup, JudgeGroupUser
+
+JUDGE_INTERVAL_FIELDS = ['judge', 'judge_group', 'judge_group__start_time', 'judge_group__end_time',
+                         'judge_group__subgroup__start_datetime']
+
+
+def get_interval(subgroup_start, start_time, end_time):
+    """
+    Judging interval of a group as datetimes. The day is taken from the subgroup start,
+    groups of unscheduled subgroups are all compared on the same day.
+    """
+    day = timezone.localtime(subgroup_start).date() if subgroup_start else date.min
+    start = datetime.combine(day, start_time)
+    end = datetime.combine(day, end_time)
+    if end < start:
+        end += timedelta(days=1)
+    return start, end
+
+
+class JudgeIntervalIndex:
+    """
+    Sorted busy intervals of every judge, looked up with a binary search.
+    Next to every position the interval ending latest among those up to it is kept,
+    so nested and overlapping intervals need no scan.
+    """
+
+    def __init__(self):
+        self._intervals = defaultdict(list)
+        self._latest = defaultdict(list)
+
+    def add(self, judge, start, end, judge_group=None):
+        intervals = self._intervals[judge]
+        latest = self._latest[judge]
+        interval = (start, end, judge_group or 0)
+        position = bisect_right(intervals, interval)
+        intervals.insert(position, interval)
+        if position and latest[position - 1][1] >= end:
+            latest.insert(position, latest[position - 1])
+            return
+        latest.insert(position, interval)
+        for following in range(position + 1, len(latest)):
+            if latest[following][1] >= end:
+                break
+            latest[following] = interval
+
+    def find_overlap(self, judge, start, end):
+        """Returns an interval overlapping [start, end) if the judge is busy then"""
+
+        position = bisect_left(self._intervals[judge], (end,)) - 1
+        if position >= 0 and start < self._latest[judge][position][1]:
+            return self._latest[judge][position]
+        return None
+
+    @classmethod
+    def for_judges(cls, judges, exclude_groups=()):
+        """Builds the index from assignments of the given judges with one query"""
+
+        index = cls()
+        assignments = JudgeGroupUser.objects.filter(judge__in=judges).exclude(judge_group__in=exclude_groups)\
+            .values_list(*JUDGE_INTERVAL_FIELDS)
+        for judge, judge_group, start_time, end_time, subgroup_start in assignments:
+            index.add(judge, *get_interval(subgroup_start, start_time, end_time), judge_group)
+        return index
+
+
+def find_conflicts(event):
+    """
+    Finds every pair of overlapping judge assignments of an event.
+    Intervals of each judge are swept in start order while a heap keeps the ones still running.
+    :param event: Event
+    :return: list of conflicts
+    """
+    intervals = defaultdict(list)
+    assignments = JudgeGroupUser.objects.filter(judge_group__subgroup__event=event)\
+        .values_list(*JUDGE_INTERVAL_FIELDS)
+    for judge, judge_group, start_time, end_time, subgroup_start in assignments:
+        intervals[judge].append((*get_interval(subgroup_start, start_time, end_time), judge_group))
+
+    conflicts = []
+    for judge, judge_intervals in intervals.items():
+        judge_intervals.sort()
+        running = []
+        for start, end, judge_group in judge_intervals:
+            while running and running[0][0] <= start:
+                heapq.heappop(running)
+            for running_end, running_start, running_group in running:
+                overlap_start = max(start, running_start)
+                conflicts.append({
+                    'judge': judge,
+                    'judge_group': running_group,
+                    'conflicting_judge_group': judge_group,
+                    'date': overlap_start.date() if overlap_start.date() != date.min else None,
+                    'start_time': overlap_start.time(),
+                    'end_time': min(end, running_end).time(),
+                })
+            heapq.heappush(running, (end, start, judge_group))
+    return conflicts
+
+
+def validate_judge_availability(groups):
+    """
+    Checks that no judge of the given groups is busy in another group at the same time
+    :param groups: list of validated judge group data, with 'id' for updated groups
+    :return: list of error messages, one per group
+    """
+    updated = {group['id'] for group in groups if group.get('id')}
+    current = {}
+    if updated:
+        for group in JudgeGroup.objects.filter(pk__in=updated).select_related('subgroup')\
+                .prefetch_related('judge_subgroup'):
+            current[group.pk] = group
+
+    resolved = []
+    for group in groups:
+        instance = current.get(group.get('id'))
+        subgroup = group.get('subgroup') or getattr(instance, 'subgroup', None)
+        start_time = group.get('start_time') or getattr(instance, 'start_time', None)
+        end_time = group.get('end_time') or getattr(instance, 'end_time', None)
+        if 'judge_subgroup' in group:
+            judges = [judge_data['judge'].pk for judge_data in group['judge_subgroup']]
+        else:
+            judges = [judge_group_user.judge_id for judge_group_user in instance.judge_subgroup.all()] \
+                if instance else []
+        if subgroup is None or start_time is None or end_time is None:
+            resolved.append((group, judges, None))
+        else:
+            resolved.append((group, judges, get_interval(subgroup.start_datetime, start_time, end_time)))
+
+    index = JudgeIntervalIndex.for_judges({judge for _, judges, _ in resolved for judge in judges},
+                                          exclude_groups=list(updated))
+    errors = []
+    for group, judges, interval in resolved:
+        messages = []
+        for judge in judges if interval else []:
+            overlap = index.find_overlap(judge, *interval)
+            if overlap:
+                messages.append(f'Судья {judge} уже назначен в это время '
+                                f'({overlap[0]:%H:%M}-{overlap[1]:%H:%M})')
+            else:
+                index.add(judge, *interval, group.get('id'))
+        errors.append(messages)
+    return errors
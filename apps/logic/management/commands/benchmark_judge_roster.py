@@ -0,0 +1,67 @@
+import time
+from datetime import time as day_time, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.account.models import User
+from apps.logic.models import Event, Subgroup
+from apps.logic.views import JudgeGroupView
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Measures query count and wall time of a bulk judge roster POST on seeded data (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--groups', type=int, nargs='+', default=[300])
+        parser.add_argument('--judges', type=int, default=3, help='Judges per group')
+
+    def handle(self, *args, **options):
+        view = JudgeGroupView.as_view({'post': 'create'})
+        self.stdout.write(f'{"groups":>8} {"links":>8} {"queries":>8} {"seconds":>8} {"status":>7}')
+        for size in options['groups']:
+            try:
+                with transaction.atomic():
+                    user, roster = self.seed(size, options['judges'])
+                    request = APIRequestFactory().post('/judge_group/', roster, format='json')
+                    force_authenticate(request, user=user)
+                    started = time.perf_counter()
+                    with CaptureQueriesContext(connection) as queries:
+                        response = view(request)
+                    elapsed = time.perf_counter() - started
+                    self.stdout.write(f'{size:>8} {size * options["judges"]:>8} {len(queries):>8} '
+                                      f'{elapsed:>8.3f} {response.status_code:>7}')
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def seed(self, size, judges_per_group):
+        now = timezone.now()
+        event = Event.objects.create(name='benchmark', place='benchmark', start_datetime=now,
+                                     finish_datetime=now + timedelta(days=1))
+        subgroups = Subgroup.objects.bulk_create([
+            Subgroup(event=event, sex=i % 2 + 1, is_confirmed=True, start_datetime=now) for i in range(size)
+        ])
+        judges = User.objects.bulk_create([
+            User(name='Judge', surname=str(i), number=f'bench-{event.pk}-{i}', email=f'bench-{event.pk}-{i}@judge',
+                 is_judge=True)
+            for i in range(size * judges_per_group)
+        ])
+        roster = [
+            {
+                'subgroup': subgroup.pk,
+                'start_time': day_time(9, 0).isoformat(),
+                'end_time': day_time(10, 0).isoformat(),
+                'judge_subgroup': [{'judge': judge.pk}
+                                   for judge in judges[i * judges_per_group:(i + 1) * judges_per_group]],
+            }
+            for i, subgroup in enumerate(subgroups)
+        ]
+        return judges[0], roster
@@ -0,0 +1,67 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.account.models import Athlete
+from apps.logic.models import Event, AgeGroup, Discipline, Application, AthleteApplication
+from apps.logic.protocol import generate_subgroups
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Measures query count and wall time of protocol generation on seeded data (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--athletes', type=int, nargs='+', default=[500, 1000, 5000])
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{"athletes":>10} {"queries":>8} {"seconds":>8}')
+        for size in options['athletes']:
+            try:
+                with transaction.atomic():
+                    event = self.seed(size)
+                    started = time.perf_counter()
+                    with CaptureQueriesContext(connection) as queries:
+                        generate_subgroups(event)
+                    elapsed = time.perf_counter() - started
+                    self.stdout.write(f'{size:>10} {len(queries):>8} {elapsed:>8.3f}')
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def seed(self, size):
+        now = timezone.now()
+        event = Event.objects.create(name='benchmark', place='benchmark', start_datetime=now,
+                                     finish_datetime=now + timedelta(days=2))
+        age_groups = [(7, 11), (12, 15), (16, 17), (18, 35)]
+        AgeGroup.objects.bulk_create([
+            AgeGroup(event=event, name=f'{min_age}-{max_age}', min_age=min_age, max_age=max_age)
+            for min_age, max_age in age_groups
+        ])
+        disciplines = Discipline.objects.bulk_create([
+            Discipline(category=category, with_weapon=with_weapon)
+            for category in (Discipline.traditional, Discipline.sport)
+            for with_weapon in (False, True)
+        ])
+        athletes = Athlete.objects.bulk_create([
+            Athlete(name='Athlete', surname=str(i), phone_number=f'bench-{event.pk}-{i}',
+                    sex=i % 2 + 1, birthday=date.today() - timedelta(days=365 * (7 + i % 28)))
+            for i in range(size)
+        ])
+        applications = Application.objects.bulk_create([
+            Application(event=event, discipline=disciplines[i % len(disciplines)], is_confirmed=True)
+            for i in range(size)
+        ])
+        AthleteApplication.objects.bulk_create([
+            AthleteApplication(athlete=athlete, application=application,
+                               event_age_group='{}-{} лет'.format(*age_groups[i % len(age_groups)]))
+            for i, (athlete, application) in enumerate(zip(athletes, applications))
+        ])
+        return event
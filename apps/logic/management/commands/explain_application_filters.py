@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from apps.logic.query_plans import analyze_applications, get_filter_plans, seed_applications
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Fails when hot application filters are not planned with their indexes on seeded data (rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--applications', type=int, default=50000)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Query plans are checked on PostgreSQL only')
+        failures = []
+        try:
+            with transaction.atomic():
+                trainer, assistant = seed_applications(options['applications'])
+                with connection.cursor() as cursor:
+                    analyze_applications(cursor)
+                for name, queryset, index in get_filter_plans(trainer, assistant):
+                    plan = queryset.explain()
+                    self.stdout.write(f'{name}: {index if index in plan else "index not used"}')
+                    if index not in plan:
+                        failures.append(f'{name}, expected {index}\n{plan}')
+                raise Rollback
+        except Rollback:
+            pass
+        if failures:
+            raise CommandError('Filters planned without their indexes:\n\n' + '\n\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS('All application filters use their indexes'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from apps.logic.models import Event, EventStatistic
+
+
+class Command(BaseCommand):
+    help = 'Recalculates materialized event registration statistics'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--event', type=int, help='Rebuild only the statistics of this event')
+
+    def handle(self, *args, **options):
+        event = Event.objects.get(pk=options['event']) if options['event'] else None
+        total = EventStatistic.objects.rebuild(event)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {total} statistic rows'))
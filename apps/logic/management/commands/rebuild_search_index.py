@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from apps.common.search import get_searchable_models, refresh_search_documents
+
+
+class Command(BaseCommand):
+    help = 'Recalculates search documents and vectors of every searchable model'
+
+    def handle(self, *args, **options):
+        for model in get_searchable_models():
+            updated = refresh_search_documents(model)
+            self.stdout.write(self.style.SUCCESS(f'{model._meta.label}: updated {updated} rows'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from apps.common.response_cache import get_metrics, reset_metrics
+
+CACHED_VIEWS = ['EventView', 'SubgroupView', 'ApplicationView']
+
+
+class Command(BaseCommand):
+    help = 'Shows hit and miss counters of cached list endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Reset the counters after printing them')
+
+    def handle(self, *args, **options):
+        for view_name, metrics in get_metrics(CACHED_VIEWS).items():
+            total = metrics['hit'] + metrics['miss']
+            ratio = metrics['hit'] / total * 100 if total else 0
+            self.stdout.write(f'{view_name}: {metrics["hit"]} hits, {metrics["miss"]} misses ({ratio:.1f}% hit rate)')
+        if options['reset']:
+            reset_metrics(CACHED_VIEWS)
@@ -1,9 +1,17 @@
-from django.db import models
+from bisect import bisect_left
+from itertools import accumulate
+
+from django.db import models, transaction
+from django.db.models import CharField, Count, Exists, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Cast, Concat
 
 from apps.account.models import User, Club, Athlete
+from apps.common.cache import ReferenceCache
+from apps.common.search import SearchableModel
+from apps.common.versioning import bump_version
 
 
-class Event(models.Model):
+class Event(SearchableModel):
     name = models.CharField(max_length=100, blank=True, null=True)
     start_datetime = models.DateTimeField()
     finish_datetime = models.DateTimeField()
@@ -14,16 +22,67 @@ class Event(models.Model):
     note = models.TextField(default=None, blank=True, null=True)
     is_protocoled = models.BooleanField(default=False)
 
+    search_document_fields = ['name', 'start_datetime', 'finish_datetime', 'place', 'note', 'lead_judge__name',
+                              'lead_judge__surname', 'assistant__name', 'assistant__surname']
+
+    class Meta(SearchableModel.Meta):
+        indexes = SearchableModel.Meta.indexes + [
+            models.Index(fields=['start_datetime', 'id']),
+            models.Index(fields=['finish_datetime']),
+        ]
+
     def __str__(self):
         return f'{self.name},{self.start_datetime},{self.finish_datetime}'
 
 
+class AgeGroupManager(models.Manager):
+    def get_index(self, event_id):
+        """
+        Returns age brackets of an event sorted by min_age and max_age, cached until age groups change
+        :param event_id: int
+        :return: tuple of running maximums of max ages and (min_age, max_age, label) brackets
+        """
+        return age_group_index.get(event_id)
+
+    def invalidate_index(self, event_id):
+        age_group_index.invalidate(event_id)
+
+    def resolve(self, event_id, age):
+        """
+        Finds the label of the first bracket in (min_age, max_age) order containing an age,
+        the rule reassign_age_groups applies in SQL, so nested brackets resolve the same way.
+        The first bracket reaching the age is found by a binary search over the running maximums of max ages,
+        when it starts above the age so do all later brackets.
+        """
+        if event_id is None or age is None:
+            return None
+        max_ages, brackets = self.get_index(event_id)
+        position = bisect_left(max_ages, age)
+        if position < len(brackets) and brackets[position][0] <= age:
+            return brackets[position][2]
+        return None
+
+
+def load_age_group_index(event_id):
+    brackets = [
+        (min_age, max_age, AgeGroup.label(min_age, max_age))
+        for min_age, max_age in AgeGroup.objects.filter(event=event_id).order_by('min_age', 'max_age')
+        .values_list('min_age', 'max_age')
+    ]
+    return list(accumulate((bracket[1] for bracket in brackets), max)), brackets
+
+
+age_group_index = ReferenceCache('age_group_index', load_age_group_index)
+
+
 class AgeGroup(models.Model):
     name = models.CharField(max_length=100)
     min_age = models.IntegerField()
     max_age = models.IntegerField()
     event = models.ForeignKey(Event, related_name='age_groups', on_delete=models.CASCADE, blank=True, null=True)
 
+    objects = AgeGroupManager()
+
     class Meta:
         unique_together = ['event', 'name']
         ordering = ['name']
@@ -31,6 +90,10 @@ class AgeGroup(models.Model):
     def __str__(self):
         return f'{self.event},{self.name}'
 
+    @staticmethod
+    def label(min_age, max_age):
+        return f'{min_age}-{max_age} лет'
+
 
 class Discipline(models.Model):
     traditional = 1
@@ -74,24 +137,61 @@ class Application(models.Model):
     taizi_cuanshu = models.BooleanField(default=False)
     taizi_cise = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['trainer', 'is_confirmed']),
+            models.Index(fields=['event', 'is_confirmed']),
+            models.Index(fields=['team_number'], name='application_team_number',
+                         condition=models.Q(team_number__isnull=False)),
+        ]
+
     def __str__(self):
         return f'{self.trainer},{self.event}'
 
 
+class AthleteApplicationManager(models.Manager):
+    def reassign_age_groups(self, event):
+        """
+        Recalculates event_age_group of every athlete application of an event with one UPDATE
+        :param event: Event
+        :return: number of updated rows
+        """
+        label = Concat(Cast('min_age', CharField()), Value('-'), Cast('max_age', CharField()), Value(' лет'),
+                       output_field=CharField())
+        age_group = AgeGroup.objects.filter(event=event, min_age__lte=OuterRef('current_age'),
+                                            max_age__gte=OuterRef('current_age')).order_by('min_age', 'max_age')
+        athlete_age_group = Athlete.objects.with_age().filter(pk=OuterRef('athlete'))\
+            .values(age_group=Subquery(age_group.annotate(label=label).values('label')[:1]))
+        updated = self.filter(application__event=event).update(event_age_group=Subquery(athlete_age_group))
+        bump_version(AthleteApplication)
+        EventStatistic.objects.rebuild(event)
+        return updated
+
+
 class AthleteApplication(models.Model):
     athlete = models.ForeignKey(Athlete, related_name='athlete_application', on_delete=models.CASCADE)
     application = models.ForeignKey(Application, related_name='application_athlete', on_delete=models.CASCADE)
     event_age_group = models.CharField(max_length=255, null=True, blank=True)
 
+    objects = AthleteApplicationManager()
+
     def save(self, *args, **kwargs):
-        age_group = AgeGroup.objects.filter(event=self.application.event)
-        for i in age_group:
-            if self.athlete.age in range(i.min_age, i.max_age + 1):
-                self.event_age_group = f'{i.min_age}-{i.max_age} лет'
-            else:
-                continue
+        self.assign_age_group()
         super().save(*args, **kwargs)
 
+    def statistic_key(self):
+        """Event statistic row the link is counted in, None while the application is not confirmed"""
+
+        if not self.application.is_confirmed:
+            return None
+        return self.application.event_id, self.application.discipline_id, self.athlete.sex, self.event_age_group
+
+    def assign_age_group(self):
+        """Sets event_age_group from the event age brackets without touching the database, None when none fits"""
+
+        age = self.athlete.age if self.athlete.birthday is not None else None
+        self.event_age_group = AgeGroup.objects.resolve(self.application.event_id, age)
+
 
 class Subgroup(models.Model):
     female = 1
@@ -162,3 +262,113 @@ class JudgeGroup(models.Model):
 class JudgeGroupUser(models.Model):
     judge_group = models.ForeignKey(JudgeGroup, on_delete=models.CASCADE, related_name='judge_subgroup')
     judge = models.ForeignKey(User, on_delete=models.CASCADE)
+
+
+class EventStatisticManager(models.Manager):
+    def apply(self, changes):
+        """
+        Adds count deltas to the statistic rows
+        :param changes: mapping of (event_id, discipline_id, sex, age_group) to a delta
+        """
+        for (event, discipline, sex, age_group), delta in changes.items():
+            if event is None or not delta:
+                continue
+            statistic, _ = self.get_or_create(event_id=event, discipline_id=discipline, sex=sex, age_group=age_group)
+            self.filter(pk=statistic.pk).update(total=F('total') + delta)
+
+    @transaction.atomic
+    def rebuild(self, event=None):
+        """
+        Recalculates statistics from confirmed athlete applications
+        :param event: Event or None for all events
+        :return: number of statistic rows
+        """
+        statistics = self.all()
+        athlete_applications = AthleteApplication.objects.filter(application__is_confirmed=True,
+                                                                 application__event__isnull=False)
+        if event is not None:
+            statistics = statistics.filter(event=event)
+            athlete_applications = athlete_applications.filter(application__event=event)
+        rows = athlete_applications.values('application__event', 'application__discipline', 'athlete__sex',
+                                           'event_age_group').annotate(total=Count('id')).order_by()
+        statistics.delete()
+        created = self.bulk_create([
+            EventStatistic(event_id=row['application__event'], discipline_id=row['application__discipline'],
+                           sex=row['athlete__sex'], age_group=row['event_age_group'], total=row['total'])
+            for row in rows
+        ])
+        return len(created)
+
+    def backfill(self):
+        """
+        Rebuilds statistics of events with confirmed applications but without statistic rows,
+        which are events registered before the statistics were stored
+        :return: number of rebuilt events
+        """
+        confirmed = AthleteApplication.objects.filter(application__event=OuterRef('pk'), application__is_confirmed=True)
+        events = list(Event.objects.using(self.db).filter(Exists(confirmed))
+                      .exclude(Exists(self.filter(event=OuterRef('pk')))))
+        for event in events:
+            self.rebuild(event)
+        return len(events)
+
+
+class EventStatistic(models.Model):
+    """Number of confirmed athlete applications of an event by discipline, sex and age group"""
+
+    event = models.ForeignKey(Event, related_name='statistics', on_delete=models.CASCADE)
+    discipline = models.ForeignKey(Discipline, on_delete=models.CASCADE, null=True, blank=True)
+    sex = models.IntegerField(choices=Athlete.CHOICES)
+    age_group = models.CharField(max_length=255, null=True, blank=True)
+    total = models.IntegerField(default=0)
+
+    objects = EventStatisticManager()
+
+    class Meta:
+        # NULLs are distinct in unique indexes, rows without discipline or age group need partial constraints
+        constraints = [
+            models.UniqueConstraint(fields=['event', 'discipline', 'sex', 'age_group'],
+                                    name='eventstatistic_unique_key'),
+            models.UniqueConstraint(fields=['event', 'sex', 'age_group'], condition=Q(discipline__isnull=True),
+                                    name='eventstatistic_unique_key_no_discipline'),
+            models.UniqueConstraint(fields=['event', 'discipline', 'sex'], condition=Q(age_group__isnull=True),
+                                    name='eventstatistic_unique_key_no_age_group'),
+            models.UniqueConstraint(fields=['event', 'sex'],
+                                    condition=Q(discipline__isnull=True, age_group__isnull=True),
+                                    name='eventstatistic_unique_key_no_discipline_age_group'),
+        ]
+
+    def __str__(self):
+        return f'{self.event},{self.discipline},{self.sex},{self.age_group}'
+
+
+class ProtocolJob(models.Model):
+    """Background generation of event protocol subgroups"""
+
+    pending = 'PENDING'
+    running = 'RUNNING'
+    done = 'DONE'
+    failed = 'FAILED'
+    CHOICES = [
+        (pending, "В очереди"),
+        (running, "Выполняется"),
+        (done, "Завершено"),
+        (failed, "Ошибка"),
+    ]
+    ACTIVE = [pending, running]
+
+    event = models.ForeignKey(Event, related_name='protocol_jobs', on_delete=models.CASCADE)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True)
+    status = models.CharField(max_length=10, choices=CHOICES, default=pending)
+    progress = models.IntegerField(default=0)
+    message = models.CharField(max_length=255, blank=True, default='')
+    subgroups_total = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.event},{self.status},{self.progress}%'
+
+    @property
+    def group_name(self):
+        return f'protocol_job__{self.pk}'
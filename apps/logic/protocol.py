@@ -0,0 +1,42 @@
+from django.db import transaction
+
+from apps.common.versioning import bump_version
+from apps.logic.models import AthleteApplication, Subgroup, SubgroupApplication
+
+
+@transaction.atomic
+def generate_subgroups(event):
+    """
+    Builds protocol subgroups and their memberships for an event.
+    Confirmed athlete applications are grouped by discipline, sex and age group,
+    then subgroups and memberships are written with two bulk inserts.
+    :param event: Event
+    :return: list of created subgroups
+    """
+    athlete_applications = AthleteApplication.objects.filter(
+        application__event=event,
+        application__is_confirmed=True,
+        application__discipline__isnull=False,
+    ).values_list('pk', 'application__discipline', 'athlete__sex', 'event_age_group').order_by('pk')
+
+    groups = {}
+    for pk, discipline, sex, age_group in athlete_applications:
+        groups.setdefault((discipline, sex, age_group), []).append(pk)
+    if not groups:
+        return []
+
+    subgroups = Subgroup.objects.bulk_create([
+        Subgroup(event=event, discipline_id=discipline, sex=sex, age_group=age_group)
+        for discipline, sex, age_group in groups
+    ])
+    SubgroupApplication.objects.bulk_create([
+        SubgroupApplication(subgroup=subgroup, application_id=pk)
+        for subgroup, pks in zip(subgroups, groups.values())
+        for pk in pks
+    ])
+    bump_version(Subgroup)
+    bump_version(SubgroupApplication)
+
+    event.is_protocoled = True
+    event.save(update_fields=['is_protocoled'])
+    return subgroups
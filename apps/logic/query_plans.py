@@ -0,0 +1,67 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from apps.account.models import User
+from apps.logic.filters import ApplicationFilter
+from apps.logic.models import Application, Event
+
+TRAINERS = 500
+EVENTS = 5000
+UPCOMING_EVENTS = 50
+
+
+def index_name(model, *fields):
+    return next(index.name for index in model._meta.indexes if tuple(index.fields) == fields)
+
+
+def seed_applications(size):
+    """
+    Stores applications with the selectivity of a real federation: many trainers,
+    years of finished events with only a few upcoming ones and rare team numbers
+    :param size: number of applications
+    :return: trainer and assistant to filter by
+    """
+    now = timezone.now()
+    trainers = User.objects.bulk_create([
+        User(name='Trainer', surname=str(i), number=f'explain-{i}', email=f'explain-{i}@trainer')
+        for i in range(TRAINERS)
+    ])
+    events = Event.objects.bulk_create([
+        Event(name='explain', place='explain', start_datetime=now + timedelta(days=i - EVENTS + UPCOMING_EVENTS),
+              finish_datetime=now + timedelta(days=i - EVENTS + UPCOMING_EVENTS + 1),
+              assistant=trainers[i % len(trainers)])
+        for i in range(EVENTS)
+    ], batch_size=1000)
+    Application.objects.bulk_create([
+        Application(event=events[i % len(events)], trainer=trainers[i % len(trainers)],
+                    is_confirmed=i % 3 == 0, team_number=i // 10 % 400 if i % 10 == 0 else None)
+        for i in range(size)
+    ], batch_size=1000)
+    return trainers[0], trainers[1]
+
+
+def get_filter_plans(trainer, assistant):
+    """
+    Hot application filters with the index each of them has to be planned with
+    :return: list of (name, queryset, index name)
+    """
+    now = timezone.localtime().strftime('%Y-%m-%d %H:%M:%S')
+    applications = Application.objects.all()
+
+    def application_filter(**data):
+        return ApplicationFilter(data, queryset=applications).qs
+
+    return [
+        ('trainer scope', application_filter(trainer=trainer.pk, is_confirmed=True),
+         index_name(Application, 'trainer', 'is_confirmed')),
+        ('assistant scope', applications.filter(event__assistant=assistant, is_confirmed=True),
+         index_name(Application, 'event', 'is_confirmed')),
+        ('team number', application_filter(team_number=10), 'application_team_number'),
+        ('new applications', application_filter(new_application=now), index_name(Event, 'finish_datetime')),
+    ]
+
+
+def analyze_applications(cursor):
+    cursor.execute('ANALYZE logic_application')
+    cursor.execute('ANALYZE logic_event')
@@ -0,0 +1,137 @@
+import hashlib
+import os
+from datetime import timedelta
+from io import BytesIO
+from itertools import groupby
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from apps.account.models import Athlete, Club
+from apps.common.tasks import run_after_commit
+from apps.common.versioning import get_versions, version_key
+from apps.logic.exports import protocol_rows
+from apps.logic.models import AthleteApplication, Discipline, Event, Subgroup, SubgroupApplication
+
+PROTOCOL_DIRECTORY = 'protocols'
+PROTOCOL_MODELS = [Event, Subgroup, SubgroupApplication, AthleteApplication, Discipline, Athlete, Club]
+PROTOCOL_RETENTION = timedelta(hours=1)
+PROTOCOL_TABLE_HEADER = ['№', 'Фамилия', 'Имя', 'Клуб', 'Возрастная группа', 'Разряд']
+
+
+def get_font():
+    """Registers the configured font with Cyrillic glyphs, falling back to a built-in one"""
+
+    if 'Protocol' in pdfmetrics.getRegisteredFontNames():
+        return 'Protocol'
+    if os.path.exists(settings.PROTOCOL_FONT):
+        pdfmetrics.registerFont(TTFont('Protocol', settings.PROTOCOL_FONT))
+        return 'Protocol'
+    return 'Helvetica'
+
+
+def protocol_digest(event):
+    """Content hash of the event protocol rows, changes only when the printed data changes"""
+
+    digest = hashlib.sha256()
+    for row in protocol_rows(event):
+        digest.update(repr(row).encode())
+    return digest.hexdigest()
+
+
+def protocol_path(event, digest):
+    return f'{PROTOCOL_DIRECTORY}/{event.pk}/{digest}.pdf'
+
+
+def build_protocol_pdf(event):
+    font = get_font()
+    styles = getSampleStyleSheet()
+    for style in styles.byName.values():
+        style.fontName = font
+
+    story = [Paragraph(escape(f'Протокол: {event.name or ""}, {event.place}'), styles['Title'])]
+    for _, rows in groupby(protocol_rows(event), key=lambda row: row[0]):
+        rows = list(rows)
+        _, discipline, sex, age_group, start = rows[0][:5]
+        story.append(Paragraph(escape(', '.join(filter(None, [discipline, sex, age_group, start]))),
+                               styles['Heading3']))
+        table = Table([PROTOCOL_TABLE_HEADER] + [[number, *row[5:]] for number, row in enumerate(rows, 1)],
+                      repeatRows=1)
+        table.setStyle(TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), font),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+        ]))
+        story += [table, Spacer(0, 12)]
+
+    buffer = BytesIO()
+    SimpleDocTemplate(buffer, pagesize=A4, title=f'protocol_{event.pk}').build(story)
+    return buffer.getvalue()
+
+
+def render_protocol(event):
+    """
+    Renders the event protocol unless a file for the current content already exists
+    :param event: Event
+    :return: storage path of the protocol
+    """
+    path = protocol_path(event, protocol_digest(event))
+    if not default_storage.exists(path):
+        saved = default_storage.save(path, ContentFile(build_protocol_pdf(event)))
+        if saved != path:
+            default_storage.delete(saved)
+    return path
+
+
+def get_protocol_path(event):
+    """
+    Storage path of the current event protocol. The path is remembered with version stamps
+    of the protocol data, so the content digest is recalculated only after the data changed.
+    :param event: Event
+    :return: storage path of the protocol
+    """
+    versions = hashlib.sha1(repr(get_versions([version_key(model) for model in PROTOCOL_MODELS])).encode())\
+        .hexdigest()
+    key = f'protocol:{event.pk}'
+    stored = cache.get(key)
+    if stored and stored[0] == versions and default_storage.exists(stored[1]):
+        return stored[1]
+    path = render_protocol(event)
+    cache.set(key, (versions, path), None)
+    return path
+
+
+def delete_outdated_protocols(path):
+    """Removes other protocol files of the event, keeping recent ones that may still be downloaded"""
+
+    directory = os.path.dirname(path)
+    threshold = timezone.now() - PROTOCOL_RETENTION
+    for name in default_storage.listdir(directory)[1]:
+        outdated = f'{directory}/{name}'
+        if outdated != path and default_storage.get_modified_time(outdated) < threshold:
+            default_storage.delete(outdated)
+
+
+def refresh_protocol(event):
+    """Renders the current protocol and cleans up outdated files, runs in background workers"""
+
+    if not isinstance(event, Event):
+        event = Event.objects.get(pk=event)
+    path = get_protocol_path(event)
+    delete_outdated_protocols(path)
+    return path
+
+
+def schedule_protocol_render(event):
+    run_after_commit(refresh_protocol, event.pk)
@@ -0,0 +1,61 @@
+import heapq
+from collections import defaultdict
+from datetime import timedelta
+from math import ceil
+
+from django.db import transaction
+from django.db.models import Count
+
+from apps.common.versioning import bump_version
+from apps.logic.models import Subgroup, SubgroupApplication
+
+
+def get_duration(subgroup, areas):
+    """Minutes a subgroup takes when its athletes perform on the given number of areas"""
+
+    duration = subgroup.discipline.duration if subgroup.discipline else 0
+    return float(duration) * ceil(subgroup.athletes_total / areas)
+
+
+@transaction.atomic
+def schedule_subgroups(event, areas, start=None):
+    """
+    Lays out confirmed subgroups of an event on competition areas with list scheduling.
+    The longest subgroups are placed first on the areas that become free earliest,
+    and a subgroup also waits until its athletes have finished their previous subgroups,
+    so no athlete is scheduled twice at the same time.
+    :param event: Event
+    :param areas: int, number of available competition areas
+    :param start: datetime of the first performance, event start by default
+    :return: list of scheduled subgroups
+    """
+    subgroups = list(Subgroup.objects.filter(event=event, is_confirmed=True).select_related('discipline')
+                     .annotate(athletes_total=Count('subgroup_application')))
+    athletes = defaultdict(list)
+    for subgroup, athlete in SubgroupApplication.objects.filter(subgroup__event=event, subgroup__is_confirmed=True)\
+            .values_list('subgroup', 'application__athlete'):
+        athletes[subgroup].append(athlete)
+
+    start = start or event.start_datetime
+    free_areas = [(0.0, area) for area in range(areas)]
+    athletes_free = {}
+    plan = []
+    for subgroup in subgroups:
+        needed = max(1, min(subgroup.areas_quantity, areas))
+        plan.append((-get_duration(subgroup, needed), subgroup.pk, needed, subgroup))
+    plan.sort(key=lambda item: item[:2])
+
+    for negative_duration, _, needed, subgroup in plan:
+        taken = [heapq.heappop(free_areas) for _ in range(needed)]
+        begin = max([minute for minute, _ in taken] + [athletes_free.get(athlete, 0.0)
+                                                        for athlete in athletes[subgroup.pk]])
+        end = begin - negative_duration
+        for _, area in taken:
+            heapq.heappush(free_areas, (end, area))
+        for athlete in athletes[subgroup.pk]:
+            athletes_free[athlete] = end
+        subgroup.start_datetime = start + timedelta(minutes=begin)
+
+    Subgroup.objects.bulk_update(subgroups, ['start_datetime'])
+    bump_version(Subgroup)
+    return subgroups
@@ -1,7 +1,12 @@
+from collections import Counter
+
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+
 from rest_framework import serializers
 
 from drf_extra_fields.relations import PresentablePrimaryKeyRelatedField
-from rest_framework_bulk import BulkListSerializer, BulkSerializerMixin
+from rest_framework_bulk import BulkSerializerMixin
 
 from apps.account.models import User, Athlete
 from apps.account.serializers import (
@@ -9,6 +14,15 @@ from apps.account.serializers import (
     AthleteSerializer,
     UserProfileSerializer,
 )
+from apps.common.cache import ReferenceCache
+from apps.common.serializers import (
+    BulkUpdateListSerializer,
+    DynamicFieldsMixin,
+    PreloadRelatedFieldsMixin,
+    ShapedFieldMixin,
+)
+from apps.common.versioning import bump_version
+from apps.logic.judging import validate_judge_availability
 from apps.logic.models import (
     AgeGroup,
     Athlete,
@@ -21,17 +35,19 @@ from apps.logic.models import (
     SubgroupApplication,
     JudgeGroup,
     JudgeGroupUser,
+    EventStatistic,
+    ProtocolJob,
 )
 
 
-class AgeGroupSerializer(serializers.ModelSerializer):
+class AgeGroupSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = AgeGroup
         fields = '__all__'
         read_only_fields = ['event']
 
 
-class EventSerializer(serializers.ModelSerializer):
+class EventSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     age_groups = AgeGroupSerializer(many=True)
     start_datetime = serializers.DateTimeField(format="%d-%m-%Y")
     finish_datetime = serializers.DateTimeField(format="%d-%m-%Y")
@@ -42,7 +58,7 @@ class EventSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Event
-        fields = '__all__'
+        exclude = ['search_document', 'search_vector']
 
     def create(self, validated_data):
         age_groups_data = validated_data.pop('age_groups')
@@ -52,13 +68,39 @@ class EventSerializer(serializers.ModelSerializer):
         return event
 
 
-class DisciplineSerializer(serializers.ModelSerializer):
+class DisciplineSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Discipline
         fields = '__all__'
 
 
-class TemplateApplicationSerializer(serializers.ModelSerializer):
+disciplines = ReferenceCache(
+    'disciplines',
+    lambda key: {discipline.pk: DisciplineSerializer(discipline).data for discipline in Discipline.objects.all()},
+)
+
+
+def discipline_representation(pk):
+    """Serialized discipline taken from the process-local reference cache"""
+
+    if pk is None:
+        return None
+    data = disciplines.get().get(pk)
+    if data is None:
+        data = DisciplineSerializer(Discipline.objects.get(pk=pk)).data
+    return dict(data)
+
+
+class DisciplineField(ShapedFieldMixin, serializers.PrimaryKeyRelatedField):
+    """Serialization of discipline field, written by id"""
+
+    def to_representation(self, value):
+        """ Serialize discipline instances using the discipline reference cache, shaped by ?fields="""
+
+        return self.shape_representation(discipline_representation(value.pk))
+
+
+class TemplateApplicationSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Template Application Serializer"""
 
     event = PresentablePrimaryKeyRelatedField(queryset=Event.objects.all(),
@@ -70,7 +112,7 @@ class TemplateApplicationSerializer(serializers.ModelSerializer):
         read_only_fields = ['trainers']
 
 
-class AthleteApplicationSerializer(serializers.ModelSerializer):
+class AthleteApplicationSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Athlete-Application serializer"""
 
     athlete = PresentablePrimaryKeyRelatedField(queryset=Athlete.objects.all(),
@@ -84,7 +126,58 @@ class AthleteApplicationSerializer(serializers.ModelSerializer):
         }
 
 
-class ApplicationSerializer(serializers.ModelSerializer):
+@transaction.atomic
+def create_applications(validated_data):
+    """
+    Creates applications and their athlete links with two bulk inserts.
+    Age groups are resolved in memory from the event age bracket index.
+    :param validated_data: list of validated application data
+    :return: list of created applications
+    """
+    dueling_discipline = None
+    if any(data.get('dueling_partner') is not None for data in validated_data):
+        dueling_discipline = Discipline.objects.filter(category=Discipline.dueling, is_individual=False,
+                                                       with_weapon=False).first()
+        if dueling_discipline is None:
+            raise serializers.ValidationError('Дисциплина для дуэлянь не найдена')
+
+    applications = []
+    athlete_applications = []
+    for data in validated_data:
+        data = dict(data)
+        athletes_data = data.pop('application_athlete')
+        dueling_partner = data.pop('dueling_partner', None)
+        discipline = data.pop('discipline', None)
+        if dueling_partner is not None:
+            application = Application(discipline=dueling_discipline, dueling_partner=dueling_partner, **data)
+            for athlete_data in athletes_data:
+                athlete_applications.append(AthleteApplication(application=application, **athlete_data))
+                athlete_applications.append(AthleteApplication(application=application, athlete=dueling_partner))
+        else:
+            application = Application(discipline=discipline, **data)
+            for athlete_data in athletes_data:
+                athlete_applications.append(AthleteApplication(application=application, **athlete_data))
+        applications.append(application)
+
+    Application.objects.bulk_create(applications)
+    for athlete_application in athlete_applications:
+        athlete_application.application = athlete_application.application
+        athlete_application.assign_age_group()
+    AthleteApplication.objects.bulk_create(athlete_applications)
+    bump_version(Application)
+    bump_version(AthleteApplication)
+    EventStatistic.objects.apply(Counter(filter(None, (link.statistic_key() for link in athlete_applications))))
+    return applications
+
+
+class ApplicationListSerializer(PreloadRelatedFieldsMixin, serializers.ListSerializer):
+    """Validates related objects of all applications with one query per field and creates them in one transaction"""
+
+    def create(self, validated_data):
+        return create_applications(validated_data)
+
+
+class ApplicationSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Application Serializer"""
 
     application_athlete = AthleteApplicationSerializer(many=True)
@@ -92,37 +185,18 @@ class ApplicationSerializer(serializers.ModelSerializer):
                                               presentation_serializer=EventSerializer)
     trainer = PresentablePrimaryKeyRelatedField(queryset=User.objects.all(),
                                                 presentation_serializer=RegisterUserSerializer)
+    discipline = DisciplineField(queryset=Discipline.objects.all(), required=False, allow_null=True)
 
     class Meta:
         model = Application
+        list_serializer_class = ApplicationListSerializer
         fields = '__all__'
 
-    def to_representation(self, instance):
-        data = super().to_representation(instance)
-        data['discipline'] = DisciplineSerializer(Discipline.objects.get(pk=data['discipline'])).data
-        return data
-
     def create(self, validated_data):
-        athletes_data = validated_data.pop('application_athlete')
-        dueling_partner_data = validated_data.pop('dueling_partner')
-        discipline_data = validated_data.pop('discipline')
-        if dueling_partner_data is not None:
-            dueling_discipline = Discipline.objects.filter(category=3, is_individual=False, with_weapon=False)
-            for discipline in dueling_discipline:
-                application = Application.objects.create(discipline=discipline, dueling_partner=dueling_partner_data,
-                                                         **validated_data)
-                for athlete_data in athletes_data:
-                    AthleteApplication.objects.create(application=application, **athlete_data)
-                    AthleteApplication.objects.create(application=application, athlete=dueling_partner_data)
-                return application
-        else:
-            application = Application.objects.create(discipline=discipline_data, **validated_data)
-            for athlete_data in athletes_data:
-                AthleteApplication.objects.create(application=application, **athlete_data)
-            return application
+        return create_applications([validated_data])[0]
 
 
-class SubgroupApplicationSerializer(serializers.ModelSerializer):
+class SubgroupApplicationSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Protocol subgroup-application serializer"""
 
     application = PresentablePrimaryKeyRelatedField(queryset=AthleteApplication.objects.all(),
@@ -133,25 +207,15 @@ class SubgroupApplicationSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class DisciplineField(serializers.RelatedField):
-    """Serialization of discipline field """
-
-    def to_representation(self, value):
-        """ Serialize discipline instances using a DisciplineSerializer"""
-
-        serializer = DisciplineSerializer(value)
-        return serializer.data
-
-
-class SubgroupSerializer(serializers.ModelSerializer):
+class SubgroupSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Protocol subgroup serializer"""
 
     subgroup_application = SubgroupApplicationSerializer(many=True, read_only=True)
     event = PresentablePrimaryKeyRelatedField(queryset=Event.objects.all(),
                                               presentation_serializer=EventSerializer)
     discipline = DisciplineField(read_only=True)
-    athlete_count = serializers.IntegerField(read_only=True)
-    child_status = serializers.IntegerField(read_only=True)
+    athlete_count = serializers.IntegerField(source='athletes_total', read_only=True)
+    child_status = serializers.IntegerField(source='child_status_value', read_only=True)
     width_length = serializers.CharField(max_length=10, read_only=True)
     start_datetime = serializers.DateTimeField(format="%H:%M(%d-%m-%Y)", required=False)
 
@@ -164,16 +228,54 @@ class SubgroupSerializer(serializers.ModelSerializer):
         ]
 
 
-class BulkUpdateSubgroupSerializer(BulkSerializerMixin, serializers.ModelSerializer):
+class ScheduleSerializer(serializers.Serializer):
+    """Parameters of the automatic subgroup schedule"""
+
+    event = serializers.PrimaryKeyRelatedField(queryset=Event.objects.all())
+    areas = serializers.IntegerField(min_value=1)
+    start_datetime = serializers.DateTimeField(required=False)
+
+
+class EventQuerySerializer(serializers.Serializer):
+    """The ?event= query parameter of event scoped actions"""
+
+    event = serializers.IntegerField(min_value=1, max_value=2 ** 63 - 1)
+
+
+def get_query_event(request, required=True):
+    """
+    Event named by the ?event= query parameter, 400 for a malformed id and 404 for an unknown one
+    :param request: Request
+    :param required: when False a missing parameter gives None
+    :return: Event
+    """
+    if not required and 'event' not in request.query_params:
+        return None
+    serializer = EventQuerySerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    return get_object_or_404(Event, pk=serializer.validated_data['event'])
+
+
+class ScheduledSubgroupSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    """Start time assigned to a subgroup by the scheduler"""
+
+    start_datetime = serializers.DateTimeField(format="%H:%M(%d-%m-%Y)")
+
+    class Meta:
+        model = Subgroup
+        fields = ['id', 'start_datetime']
+
+
+class BulkUpdateSubgroupSerializer(DynamicFieldsMixin, BulkSerializerMixin, serializers.ModelSerializer):
     """Serializer for Subgroup bulk update"""
 
     class Meta:
         model = Subgroup
-        list_serializer_class = BulkListSerializer
+        list_serializer_class = BulkUpdateListSerializer
         fields = '__all__'
 
 
-class JudgeGroupUserSerializer(serializers.ModelSerializer):
+class JudgeGroupUserSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """JudgeGroup User Serializer"""
 
     class Meta:
@@ -184,19 +286,91 @@ class JudgeGroupUserSerializer(serializers.ModelSerializer):
         ]
 
 
-class JudgeGroupSerializer(BulkSerializerMixin, serializers.ModelSerializer):
+@transaction.atomic
+def create_judge_groups(validated_data):
+    """
+    Creates judge groups and their judge links with two bulk inserts
+    :param validated_data: list of validated judge group data
+    :return: list of created judge groups
+    """
+    groups = []
+    judge_links = []
+    for data in validated_data:
+        data = dict(data)
+        judges_data = data.pop('judge_subgroup')
+        group = JudgeGroup(**data)
+        groups.append(group)
+        judge_links += [JudgeGroupUser(judge_group=group, **judge_data) for judge_data in judges_data]
+
+    JudgeGroup.objects.bulk_create(groups)
+    for judge_link in judge_links:
+        judge_link.judge_group_id = judge_link.judge_group.pk
+    JudgeGroupUser.objects.bulk_create(judge_links)
+    return groups
+
+
+class JudgeGroupListSerializer(BulkUpdateListSerializer):
+    """Validates judge availability of all groups of a bulk request against one interval index"""
+
+    nested_fields = ['judge_subgroup']
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        errors = validate_judge_availability(attrs)
+        if any(errors):
+            raise serializers.ValidationError([{'judge_subgroup': messages} if messages else {}
+                                               for messages in errors])
+        return attrs
+
+    def create(self, validated_data):
+        return create_judge_groups(validated_data)
+
+    def update_nested(self, instances, nested_data):
+        """Replaces judges of the groups sent with judge_subgroup using one delete and one insert"""
+
+        judges = nested_data.get('judge_subgroup', {})
+        if judges:
+            JudgeGroupUser.objects.filter(judge_group__in=list(judges)).delete()
+            JudgeGroupUser.objects.bulk_create([
+                JudgeGroupUser(judge_group=instances[pk], **judge_data)
+                for pk, judges_data in judges.items()
+                for judge_data in judges_data
+            ])
+
+
+class JudgeGroupSerializer(DynamicFieldsMixin, BulkSerializerMixin, serializers.ModelSerializer):
     """JudgeGroup Serializer"""
 
     judge_subgroup = JudgeGroupUserSerializer(many=True)
 
     class Meta:
         model = JudgeGroup
-        list_serializer_class = BulkListSerializer
+        list_serializer_class = JudgeGroupListSerializer
         fields = '__all__'
 
+    def validate(self, attrs):
+        if not isinstance(self.parent, serializers.ListSerializer):
+            messages = validate_judge_availability([{**attrs, 'id': getattr(self.instance, 'pk', None)}])[0]
+            if messages:
+                raise serializers.ValidationError({'judge_subgroup': messages})
+        return attrs
+
     def create(self, validated_data):
-        judges_group_data = validated_data.pop('judge_subgroup')
-        group = JudgeGroup.objects.create(**validated_data)
-        for judge_group_data in judges_group_data:
-            JudgeGroupUser.objects.create(judge_group=group, **judge_group_data)
-        return group
+        return create_judge_groups([validated_data])[0]
+
+
+class EventStatisticSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    """Event registration statistics serializer"""
+
+    class Meta:
+        model = EventStatistic
+        fields = '__all__'
+
+
+class ProtocolJobSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    """Protocol generation job serializer"""
+
+    class Meta:
+        model = ProtocolJob
+        fields = '__all__'
+        read_only_fields = ['event', 'created_by', 'status', 'progress', 'message', 'subgroups_total']
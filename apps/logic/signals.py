@@ -0,0 +1,101 @@
+from collections import Counter
+
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete
+from django.dispatch import receiver
+
+from apps.account.models import Athlete
+from apps.logic.models import AgeGroup, Discipline, Application, AthleteApplication, EventStatistic
+from apps.logic.serializers import disciplines
+
+STATISTIC_KEY_FIELDS = ['application__event', 'application__discipline', 'athlete__sex', 'event_age_group']
+
+
+def get_statistic_key(athlete_application_pk):
+    return AthleteApplication.objects.filter(pk=athlete_application_pk, application__is_confirmed=True)\
+        .values_list(*STATISTIC_KEY_FIELDS).first()
+
+
+def backfill_event_statistics(sender, using, **kwargs):
+    """Counts applications stored before the statistics after every migrate, later changes arrive as deltas"""
+
+    EventStatistic.objects.db_manager(using).backfill()
+
+
+@receiver([post_save, post_delete], sender=AgeGroup)
+def age_group_changed(sender, instance, **kwargs):
+    AgeGroup.objects.invalidate_index(instance.event_id)
+
+
+@receiver([post_save, post_delete], sender=Discipline)
+def discipline_changed(sender, instance, **kwargs):
+    disciplines.invalidate()
+
+
+@receiver(pre_save, sender=AthleteApplication)
+def remember_athlete_application_statistic(sender, instance, raw=False, **kwargs):
+    if not raw and instance.pk:
+        instance._statistic_key = get_statistic_key(instance.pk)
+
+
+@receiver(post_save, sender=AthleteApplication)
+def count_athlete_application(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    changes = Counter()
+    old_key = getattr(instance, '_statistic_key', None)
+    if old_key:
+        changes[old_key] -= 1
+    new_key = instance.statistic_key()
+    if new_key:
+        changes[new_key] += 1
+    EventStatistic.objects.apply(changes)
+
+
+@receiver(pre_delete, sender=AthleteApplication)
+def uncount_athlete_application(sender, instance, **kwargs):
+    key = get_statistic_key(instance.pk)
+    if key:
+        EventStatistic.objects.apply({key: -1})
+
+
+@receiver(pre_save, sender=Application)
+def remember_application_statistic(sender, instance, raw=False, **kwargs):
+    if not raw and instance.pk:
+        instance._statistic_state = Application.objects.filter(pk=instance.pk)\
+            .values_list('event', 'discipline', 'is_confirmed').first()
+
+
+@receiver(post_save, sender=Application)
+def recount_application(sender, instance, created, raw=False, **kwargs):
+    old_state = getattr(instance, '_statistic_state', None)
+    new_state = (instance.event_id, instance.discipline_id, instance.is_confirmed)
+    if raw or created or old_state is None or old_state == new_state:
+        return
+    athletes = Counter(instance.application_athlete.values_list('athlete__sex', 'event_age_group'))
+    changes = Counter()
+    for (sex, age_group), total in athletes.items():
+        if old_state[2]:
+            changes[(old_state[0], old_state[1], sex, age_group)] -= total
+        if instance.is_confirmed:
+            changes[(instance.event_id, instance.discipline_id, sex, age_group)] += total
+    EventStatistic.objects.apply(changes)
+
+
+@receiver(pre_save, sender=Athlete)
+def remember_athlete_sex(sender, instance, raw=False, **kwargs):
+    if not raw and instance.pk:
+        instance._original_sex = Athlete.objects.filter(pk=instance.pk).values_list('sex', flat=True).first()
+
+
+@receiver(post_save, sender=Athlete)
+def recount_athlete(sender, instance, created, raw=False, **kwargs):
+    old_sex = getattr(instance, '_original_sex', None)
+    if raw or created or old_sex is None or old_sex == instance.sex:
+        return
+    keys = Counter(AthleteApplication.objects.filter(athlete=instance, application__is_confirmed=True)
+                   .values_list('application__event', 'application__discipline', 'event_age_group'))
+    changes = Counter()
+    for (event, discipline, age_group), total in keys.items():
+        changes[(event, discipline, old_sex, age_group)] -= total
+        changes[(event, discipline, instance.sex, age_group)] += total
+    EventStatistic.objects.apply(changes)
@@ -1,3 +1,269 @@
-from django.test import TestCase
+from datetime import date, datetime, timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.account.models import Athlete, Club, PhysicalIndicators, User
+from apps.common.search import backfill_search_documents
+from apps.logic.jobs import run_protocol_job, start_protocol_job
+from apps.logic.judging import JudgeIntervalIndex
+from apps.logic.models import AgeGroup, Application, AthleteApplication, Discipline, Event, EventStatistic, \
+    ProtocolJob
+from apps.logic.protocol import generate_subgroups
+from apps.logic.query_plans import analyze_applications, get_filter_plans, seed_applications
+
+
+def create_event(athletes, tag='event'):
+    """Event with confirmed applications of athletes spread over disciplines, sexes and age groups"""
+
+    now = timezone.now()
+    user = User.objects.create(name='Judge', surname=tag, number=f'{tag}-judge', email=f'{tag}@example.com',
+                               role=User.ADMIN)
+    event = Event.objects.create(place='Bishkek', start_datetime=now, finish_datetime=now + timedelta(days=1),
+                                 lead_judge=user, assistant=user)
+    AgeGroup.objects.create(event=event, name='7-11', min_age=7, max_age=11)
+    AgeGroup.objects.create(event=event, name='12-40', min_age=12, max_age=40)
+    disciplines = [Discipline.objects.create(category=category, duration=2) for category in (1, 2, 3)]
+    club = Club.objects.create(name=tag)
+    for i in range(athletes):
+        indicators = PhysicalIndicators.objects.create(agility=1, strength=2, stamina=3, speed=4, stretch=5)
+        athlete = Athlete.objects.create(name='Athlete', surname=str(i), phone_number=f'{tag}-{i}',
+                                         birthday=date(2000 + i % 20, 1, 1), sex=i % 2 + 1, club=club,
+                                         physical_indicators=indicators)
+        application = Application.objects.create(event=event, trainer=user, discipline=disciplines[i % 3],
+                                                 is_confirmed=True)
+        AthleteApplication.objects.create(athlete=athlete, application=application)
+    generate_subgroups(event)
+    return event, user
+
+
+class SubgroupListQueriesTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def create_event(self, athletes, tag):
+        with self.captureOnCommitCallbacks(execute=True):
+            return create_event(athletes, tag)
+
+    def test_query_count_does_not_depend_on_subgroups(self):
+        event, user = self.create_event(6, 'small')
+        self.client.force_authenticate(user)
+        with self.assertNumQueries(4):
+            small = self.client.get('/subgroup/')
+
+        self.create_event(40, 'large')
+        with self.assertNumQueries(4):
+            large = self.client.get('/subgroup/')
+
+        self.assertEqual(small.status_code, 200)
+        self.assertGreater(len(large.data), len(small.data))
+
+
+class ApplicationBulkCreateQueriesTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event, self.user = create_event(0)
+            self.discipline = Discipline.objects.create(category=Discipline.traditional)
+            club = Club.objects.create(name='bulk')
+            self.athletes = [
+                Athlete.objects.create(name='Athlete', surname=str(i), phone_number=f'bulk-{i}', sex=i % 2 + 1,
+                                       birthday=date(2005, 1, 1), club=club)
+                for i in range(40)
+            ]
+        self.client.force_authenticate(self.user)
+
+    def post_applications(self, size):
+        payload = [{'event': self.event.pk, 'trainer': self.user.pk, 'discipline': self.discipline.pk,
+                    'is_confirmed': True, 'application_athlete': [{'athlete': athlete.pk}]}
+                   for athlete in self.athletes[:size]]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/application/', payload, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(len(response.data), size)
+        return len(queries)
+
+    def test_query_count_does_not_depend_on_payload_size(self):
+        self.post_applications(2)
+        self.assertEqual(self.post_applications(5), self.post_applications(40))
+
+
+class EventQueryParameterTest(TestCase):
+    urls = ['/subgroup/export/', '/subgroup/protocol/', '/judge_group/conflicts/', '/athletes/eligible/',
+            '/athletes/analytics/']
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(create_event(0)[1])
+
+    def test_malformed_event_is_rejected(self):
+        for url in self.urls:
+            self.assertEqual(self.client.get(url, {'event': 'abc'}).status_code, 400, url)
+            self.assertEqual(self.client.get(url, {'event': 10 ** 30}).status_code, 400, url)
+
+    def test_unknown_event_is_not_found(self):
+        for url in self.urls:
+            self.assertEqual(self.client.get(url, {'event': 999}).status_code, 404, url)
+
+
+class DisciplineShapeTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.force_authenticate(create_event(3)[1])
+
+    def test_discipline_follows_fields_and_expand(self):
+        for url in ['/application/', '/subgroup/']:
+            data = self.client.get(url, {'fields': 'id,discipline.category'}).data
+            self.assertEqual(set(data[0]), {'id', 'discipline'}, url)
+            self.assertEqual(set(data[0]['discipline']), {'category'}, url)
+
+            data = self.client.get(url, {'fields': 'id,discipline', 'expand': 'event'}).data
+            self.assertIsInstance(data[0]['discipline'], int, url)
+
+            data = self.client.get(url, {'fields': 'discipline'}).data
+            self.assertIn('duration', data[0]['discipline'], url)
+
+
+class AnonymousCachedListTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            create_event(2)
+
+    def test_anonymous_lists_are_cached(self):
+        client = APIClient()
+        for url in ['/event/', '/subgroup/']:
+            first = client.get(url)
+            second = client.get(url)
+            self.assertEqual(first.status_code, 200, url)
+            self.assertEqual((first['X-Cache'], second['X-Cache']), ('MISS', 'HIT'), url)
+            self.assertEqual(first.data, second.data, url)
+
+
+@override_settings(PROTOCOL_JOB_TIMEOUT=600)
+class ProtocolJobTest(TestCase):
+    def setUp(self):
+        self.event, self.user = create_event(0)
+
+    @mock.patch('apps.logic.jobs.run_after_commit')
+    def test_stale_job_is_replaced(self, run_after_commit):
+        job = start_protocol_job(self.event, self.user)
+        self.assertEqual(start_protocol_job(self.event, self.user), job)
+
+        ProtocolJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(seconds=601))
+        new_job = start_protocol_job(self.event, self.user)
+        job.refresh_from_db()
+        self.assertNotEqual(new_job, job)
+        self.assertEqual(job.status, ProtocolJob.failed)
+        self.assertEqual(run_after_commit.call_count, 2)
+
+    @mock.patch('apps.logic.jobs.get_channel_layer', side_effect=ConnectionError)
+    def test_notification_failure_does_not_change_status(self, get_channel_layer):
+        job = ProtocolJob.objects.create(event=self.event, created_by=self.user)
+        with self.assertLogs('apps.logic.jobs', 'ERROR'):
+            run_protocol_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ProtocolJob.done)
+        self.assertTrue(get_channel_layer.called)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Query plans are checked on PostgreSQL only')
+class ApplicationFilterPlanTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.trainer, cls.assistant = seed_applications(50000)
+
+    def test_filters_use_indexes(self):
+        with connection.cursor() as cursor:
+            analyze_applications(cursor)
+        for name, queryset, index in get_filter_plans(self.trainer, self.assistant):
+            plan = queryset.explain()
+            self.assertIn(index, plan, f'{name}\n{plan}')
+
+
+class AgeGroupResolveTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event, self.user = create_event(0, 'ages')
+            AgeGroup.objects.filter(event=self.event).delete()
+            for min_age, max_age in [(7, 17), (12, 15), (30, 40)]:
+                AgeGroup.objects.create(event=self.event, name=f'{min_age}-{max_age}', min_age=min_age,
+                                        max_age=max_age)
+
+    def link(self, age):
+        athlete = Athlete.objects.create(name='Athlete', surname=str(age), phone_number=f'ages-{age}',
+                                         birthday=date(date.today().year - age, 1, 1), sex=1)
+        application = Application.objects.create(event=self.event, trainer=self.user, is_confirmed=True)
+        return AthleteApplication.objects.create(athlete=athlete, application=application)
+
+    def test_nested_brackets_resolve_to_the_first_containing_bracket(self):
+        expected = {5: None, 7: '7-17 лет', 13: '7-17 лет', 16: '7-17 лет', 20: None, 35: '30-40 лет', 41: None}
+        for age, label in expected.items():
+            self.assertEqual(AgeGroup.objects.resolve(self.event.pk, age), label, age)
+
+    def test_stale_age_group_is_cleared(self):
+        link = self.link(16)
+        self.assertEqual(link.event_age_group, '7-17 лет')
+        with self.captureOnCommitCallbacks(execute=True):
+            AgeGroup.objects.filter(event=self.event, min_age=7).delete()
+        link.save()
+        self.assertIsNone(link.event_age_group)
+
+    @skipUnless(connection.vendor == 'postgresql', 'Athlete ages are calculated by PostgreSQL')
+    def test_reassign_agrees_with_resolve(self):
+        links = [self.link(age) for age in (5, 13, 16, 20, 35)]
+        AthleteApplication.objects.reassign_age_groups(self.event)
+        for link in links:
+            self.assertEqual(AthleteApplication.objects.get(pk=link.pk).event_age_group, link.event_age_group)
+
+
+class EventStatisticBackfillTest(TestCase):
+    def test_events_without_statistics_are_counted(self):
+        event, _ = create_event(6)
+        counted = create_event(2, 'counted')[0]
+        EventStatistic.objects.filter(event=event).delete()
+
+        self.assertEqual(EventStatistic.objects.backfill(), 1)
+        self.assertEqual(sum(EventStatistic.objects.filter(event=event).values_list('total', flat=True)), 6)
+        self.assertEqual(sum(EventStatistic.objects.filter(event=counted).values_list('total', flat=True)), 2)
+        self.assertEqual(EventStatistic.objects.backfill(), 0)
+
+
+class SearchDocumentBackfillTest(TestCase):
+    def test_rows_stored_before_indexing_get_documents(self):
+        event, user = create_event(0, 'backfill')
+        Event.objects.update(search_document='')
+        User.objects.update(search_document='')
+
+        backfill_search_documents()
+        self.assertIn('bishkek', Event.objects.get(pk=event.pk).search_document)
+        self.assertIn('backfill', User.objects.get(pk=user.pk).search_document)
+
+
+class JudgeIntervalIndexTest(SimpleTestCase):
+    def at(self, hour):
+        return datetime(2022, 7, 1, hour)
+
+    def test_finds_overlap_with_nested_intervals(self):
+        index = JudgeIntervalIndex()
+        index.add(1, self.at(11), self.at(13), 3)
+        index.add(1, self.at(1), self.at(2), 2)
+        index.add(1, self.at(0), self.at(10), 1)
+
+        self.assertEqual(index.find_overlap(1, self.at(5), self.at(6)), (self.at(0), self.at(10), 1))
+        self.assertIn(index.find_overlap(1, self.at(1), self.at(3))[2], (1, 2))
+        self.assertEqual(index.find_overlap(1, self.at(11), self.at(12)), (self.at(11), self.at(13), 3))
+        self.assertIsNone(index.find_overlap(1, self.at(10), self.at(11)))
+        self.assertIsNone(index.find_overlap(1, self.at(13), self.at(14)))
+        self.assertIsNone(index.find_overlap(2, self.at(5), self.at(6)))
@@ -16,6 +16,8 @@ from apps.logic.views import (
     JudgeGroupView,
     JudgeGroupUserView,
     SubgroupBulkUpdateView,
+    EventStatisticView,
+    ProtocolJobView,
 )
 
 router = DefaultRouter()
@@ -31,6 +33,8 @@ router.register('subgroup_application', SubgroupApplicationView)
 bulk_router.register('judge_group', JudgeGroupView)
 router.register('judge_group_user', JudgeGroupUserView)
 bulk_router.register('subroup_bulk_update', SubgroupBulkUpdateView)
+router.register('event_statistics', EventStatisticView)
+router.register('protocol_job', ProtocolJobView)
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,12 +1,27 @@
-from django.db.models import Count
+from django.core.files.storage import default_storage
+from django.db.models import Case, Count, Value, When
+from django.http import FileResponse
 
-from rest_framework.viewsets import ModelViewSet
+from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 from rest_framework import status
+from rest_framework.decorators import action
 from rest_framework.filters import SearchFilter
 from rest_framework.response import Response
 from rest_framework_bulk import BulkModelViewSet
 
+from django_filters.rest_framework import DjangoFilterBackend
+
+from apps.account.models import Athlete, Club, PhysicalIndicators, User
+from apps.common.eager_loading import EagerLoadingMixin
+from apps.common.response_cache import ResponseCacheMixin
+from apps.common.search import FullTextSearchFilter
+from apps.common.versioning import ConditionalGetMixin
 from apps.logic.filters import ApplicationFilter
+from apps.logic.exports import csv_protocol_response, xlsx_protocol_response
+from apps.logic.jobs import start_protocol_job
+from apps.logic.judging import find_conflicts
+from apps.logic.rendering import get_protocol_path, schedule_protocol_render
+from apps.logic.scheduling import schedule_subgroups
 from apps.logic.models import (
     Event,
     AgeGroup,
@@ -18,6 +33,8 @@ from apps.logic.models import (
     Subgroup,
     JudgeGroup,
     JudgeGroupUser,
+    EventStatistic,
+    ProtocolJob,
 )
 from apps.logic.serializers import (
     EventSerializer,
@@ -31,18 +48,26 @@ from apps.logic.serializers import (
     JudgeGroupSerializer,
     JudgeGroupUserSerializer,
     BulkUpdateSubgroupSerializer,
+    EventStatisticSerializer,
+    ScheduleSerializer,
+    ScheduledSubgroupSerializer,
+    ProtocolJobSerializer,
+    get_query_event,
 )
 
 
-class AgeGroupView(ModelViewSet):
+class AgeGroupView(ConditionalGetMixin, ModelViewSet):
     serializer_class = AgeGroupSerializer
     queryset = AgeGroup.objects.all()
 
 
-class EventView(ModelViewSet):
+class EventView(ConditionalGetMixin, ResponseCacheMixin, EagerLoadingMixin, ModelViewSet):
     serializer_class = EventSerializer
     queryset = Event.objects.all()
-    filter_backends = [SearchFilter]
+    version_models = [AgeGroup, User]
+    cache_models = [AgeGroup, User]
+    cursor_ordering = ['-start_datetime', '-id']
+    filter_backends = [FullTextSearchFilter]
     search_fields = ['name', 'start_datetime', 'finish_datetime', 'place', 'note', 'lead_judge__name',
                      'lead_judge__surname', 'assistant__name', 'assistant__surname']
 
@@ -58,32 +83,50 @@ class EventView(ModelViewSet):
             return Response(serializer.data)
         return Response(serializer.errors)
 
+    @action(detail=True, methods=['post'])
+    def reassign_age_groups(self, request, pk=None):
+        """Recalculate age groups of all athlete applications of the event"""
+
+        updated = AthleteApplication.objects.reassign_age_groups(self.get_object())
+        return Response({'updated': updated})
 
-class DisciplineView(ModelViewSet):
+
+class DisciplineView(ConditionalGetMixin, ModelViewSet):
     serializer_class = DisciplineSerializer
     queryset = Discipline.objects.all()
 
 
-class TemplateApplicationView(ModelViewSet):
+class TemplateApplicationView(EagerLoadingMixin, ModelViewSet):
     serializer_class = TemplateApplicationSerializer
     queryset = TemplateApplication.objects.all()
 
 
-class ApplicationView(ModelViewSet):
+class ApplicationView(ResponseCacheMixin, EagerLoadingMixin, ModelViewSet):
     serializer_class = ApplicationSerializer
     queryset = Application.objects.all()
+    cache_models = [AthleteApplication, Athlete, Club, PhysicalIndicators, Event, AgeGroup, User, Discipline]
     filter_class = ApplicationFilter
-    filter_backends = [SearchFilter]
+    filter_backends = [DjangoFilterBackend, SearchFilter]
     search_fields = ['event']
 
     def get_queryset(self):
         """Filter queryset by user role"""
 
+        queryset = super().get_queryset()
         user = self.request.user
         if user.role == 'TRAINER' and user.is_assistant is False:
-            return self.queryset.filter(trainer=self.request.user)
+            return queryset.filter(trainer=self.request.user)
         elif user.role == 'TRAINER' and user.is_assistant is True:
-            return self.queryset.filter(event__assistant=self.request.user)
+            return queryset.filter(event__assistant=self.request.user)
+        return queryset
+
+    def get_cache_scope(self, request):
+        user = request.user
+        if not user.is_authenticated:
+            return 'anonymous'
+        if user.role == 'TRAINER':
+            return f'{"assistant" if user.is_assistant else "trainer"}:{user.pk}'
+        return user.role
 
     def create(self, request, *args, **kwargs):
         """Creating multiple objects with one request"""
@@ -91,6 +134,7 @@ class ApplicationView(ModelViewSet):
         serializer = self.get_serializer(data=request.data, many=isinstance(request.data, list))
         serializer.is_valid(raise_exception=True)
         self.perform_create(serializer)
+        self.eager_load(serializer.instance if isinstance(serializer.instance, list) else [serializer.instance])
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, headers=headers)
 
@@ -100,7 +144,7 @@ class ApplicationView(ModelViewSet):
         serializer.save(trainer=self.request.user)
 
 
-class AthleteApplicationView(ModelViewSet):
+class AthleteApplicationView(EagerLoadingMixin, ModelViewSet):
     serializer_class = AthleteApplicationSerializer
     queryset = AthleteApplication.objects.all()
 
@@ -110,48 +154,92 @@ class SubgroupBulkUpdateView(BulkModelViewSet):
     queryset = Subgroup.objects.all()
 
 
-class SubgroupView(ModelViewSet):
+class SubgroupView(ResponseCacheMixin, EagerLoadingMixin, ModelViewSet):
     serializer_class = SubgroupSerializer
-    queryset = Subgroup.objects.all()
+    queryset = Subgroup.objects.annotate(
+        athletes_total=Count('subgroup_application'),
+        child_status_value=Case(When(age_group__contains='12', then=Value(1)), default=Value(2)),
+    )
+    cache_models = [SubgroupApplication, AthleteApplication, Athlete, Club, PhysicalIndicators, Event, AgeGroup,
+                    User, Discipline]
 
     def create(self, request, *args, **kwargs):
-        """Business logic of generating protocol subgroups"""
+        """Queue generation of protocol subgroups, progress is reported by the returned job"""
 
-        serializer = self.serializer_class(data=request.data)
-        if serializer.is_valid():
-            event = serializer.validated_data['event']
-            athlete_application = AthleteApplication.objects.filter(application__event=event.pk, application__is_confirmed=True)\
-                .values('application__discipline', 'application__event', 'athlete__sex', 'event_age_group')\
-                .annotate(total=Count('id'))
-            if athlete_application:
-                for i in athlete_application:
-                    discipline = Discipline.objects.filter(pk=i['application__discipline'])
-                    for f in discipline:
-                        subgroup = Subgroup.objects.create(discipline=f, sex=i['athlete__sex'],
-                                                           age_group=i['event_age_group'], event=event)
-                        for athlete_data in AthleteApplication.objects.filter(application__event=subgroup.event,
-                                                                              application__discipline=subgroup.discipline,
-                                                                              event_age_group=subgroup.age_group,
-                                                                              athlete__sex=subgroup.sex):
-                            SubgroupApplication.objects.create(application=athlete_data, subgroup=subgroup)
-                        serializer.save()
-                Subgroup.objects.filter(sex=3, discipline__isnull=True).delete()
-                event.is_protocoled = True
-                event.save()
-                return Response(serializer.data, status=status.HTTP_201_CREATED)
-            return Response('Одобренных заявок для данного мероприятия не найдено')
-
-
-class SubgroupApplicationView(ModelViewSet):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = start_protocol_job(serializer.validated_data['event'], request.user)
+        return Response(ProtocolJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False)
+    def export(self, request):
+        """Download the event protocol as a streamed csv or an xlsx file"""
+
+        event = get_query_event(request)
+        if request.query_params.get('extension') == 'xlsx':
+            return xlsx_protocol_response(event)
+        return csv_protocol_response(event)
+
+    @action(detail=False, methods=['post'])
+    def schedule(self, request):
+        """Assign start times to confirmed subgroups of an event across competition areas"""
+
+        serializer = ScheduleSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        event = serializer.validated_data['event']
+        subgroups = schedule_subgroups(event, serializer.validated_data['areas'],
+                                       serializer.validated_data.get('start_datetime'))
+        schedule_protocol_render(event)
+        return Response(ScheduledSubgroupSerializer(subgroups, many=True).data)
+
+    @action(detail=False)
+    def protocol(self, request):
+        """Download the printable event protocol, rendered once per protocol content"""
+
+        event = get_query_event(request)
+        return FileResponse(default_storage.open(get_protocol_path(event)), filename=f'protocol_{event.pk}.pdf',
+                            content_type='application/pdf')
+
+
+class SubgroupApplicationView(EagerLoadingMixin, ModelViewSet):
     serializer_class = SubgroupApplicationSerializer
     queryset = SubgroupApplication.objects.all()
 
 
-class JudgeGroupView(BulkModelViewSet):
+class JudgeGroupView(EagerLoadingMixin, BulkModelViewSet):
     serializer_class = JudgeGroupSerializer
     queryset = JudgeGroup.objects.all()
 
+    def perform_bulk_create(self, serializer):
+        super().perform_bulk_create(serializer)
+        self.eager_load(serializer.instance)
+
+    def perform_bulk_update(self, serializer):
+        super().perform_bulk_update(serializer)
+        self.eager_load(serializer.instance)
+
+    @action(detail=False)
+    def conflicts(self, request):
+        """Report judges assigned to overlapping groups of an event"""
+
+        event = get_query_event(request)
+        return Response(find_conflicts(event))
+
 
 class JudgeGroupUserView(ModelViewSet):
     serializer_class = JudgeGroupUserSerializer
     queryset = JudgeGroupUser.objects.all()
+
+
+class EventStatisticView(ReadOnlyModelViewSet):
+    serializer_class = EventStatisticSerializer
+    queryset = EventStatistic.objects.all()
+    filter_backends = [DjangoFilterBackend]
+    filter_fields = ['event', 'discipline', 'sex', 'age_group']
+
+
+class ProtocolJobView(ReadOnlyModelViewSet):
+    serializer_class = ProtocolJobSerializer
+    queryset = ProtocolJob.objects.all()
+    filter_backends = [DjangoFilterBackend]
+    filter_fields = ['event', 'status']
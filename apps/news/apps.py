@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class NewsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.news'
+
+    def ready(self):
+        from apps.common.images import track_image_variants
+        from apps.common.versioning import track_versions
+        from apps.news.models import News
+        track_versions(News)
+        track_image_variants(News, 'picture')
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.5 on 2026-10-18 10:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='news',
+            name='picture_digest',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+    ]
@@ -5,6 +5,7 @@ class News(models.Model):
     title = models.CharField(max_length=225, blank=True, null=True)
     description = models.TextField()
     picture = models.ImageField(default=None, blank=True, null=True)
+    picture_digest = models.CharField(max_length=64, blank=True, default='', editable=False)
     created_date = models.DateField(auto_now_add=True, null=True)
 
     def __str__(self):
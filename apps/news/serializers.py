@@ -1,9 +1,13 @@
 from rest_framework import serializers
+
+from apps.common.images import ImageVariantsField
 from apps.news.models import News
 
 
 class NewsSerializer(serializers.ModelSerializer):
+    picture_variants = ImageVariantsField('picture')
+
     class Meta:
         model = News
-        fields = '__all__'
+        exclude = ['picture_digest']
         read_only_fields = ['created_date']
\ No newline at end of file
@@ -1,11 +1,12 @@
 from rest_framework import generics
 from rest_framework.filters import SearchFilter
 
+from apps.common.versioning import ConditionalGetMixin
 from apps.news.serializers import NewsSerializer
 from apps.news.models import News
 
 
-class NewsView(generics.ListCreateAPIView):
+class NewsView(ConditionalGetMixin, generics.ListCreateAPIView):
     serializer_class = NewsSerializer
     queryset = News.objects.all()
     filter_backends = [SearchFilter]
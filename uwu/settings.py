@@ -41,6 +41,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     # Frameworks and libraries
     'django_filters',
@@ -103,6 +104,13 @@ CHANNEL_LAYERS = {
     },
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://127.0.0.1:6379/1',
+    },
+}
+
 
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
@@ -164,6 +172,21 @@ STATICFILES_DIRS = ()
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# Background workers
+
+BACKGROUND_WORKERS = config('BACKGROUND_WORKERS', default=2, cast=int)
+
+# Response cache
+
+RESPONSE_CACHE_TIMEOUT = config('RESPONSE_CACHE_TIMEOUT', default=300, cast=int)
+
+# Protocol rendering
+
+PROTOCOL_FONT = config('PROTOCOL_FONT', default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
+
+# Active protocol jobs without progress for this many seconds are considered lost
+PROTOCOL_JOB_TIMEOUT = config('PROTOCOL_JOB_TIMEOUT', default=600, cast=int)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -182,6 +205,7 @@ REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend'
     ],
+    'DEFAULT_PAGINATION_CLASS': 'apps.common.pagination.OptionalCursorPagination',
     'DATETIME_FORMAT': "%d-%m-%Y %H:%M",
     'TIME_FORMAT': "%H:%M",
 }
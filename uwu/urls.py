@@ -21,6 +21,8 @@ from rest_framework.permissions import AllowAny
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
+from apps.common.views import ImageVariantView
+
 schema_view = get_schema_view(
     openapi.Info(
         title="WUSHU API",
@@ -40,6 +42,8 @@ urlpatterns = [
     path("rest-login/", include("rest_framework.urls")),
     path("swagger/", schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path("", include("apps.news.urls")),
+    path("images/<str:label>/<int:pk>/<str:field_name>/<str:variant>/", ImageVariantView.as_view(),
+         name="image_variant"),
 ]
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)